@@ -0,0 +1,111 @@
+import bisect
+import heapq
+import re
+from collections import Counter
+
+# Word boundaries shared with the spell checker
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]+\b')
+# Runs of word characters touching an edit; words can only change inside them
+LEFT_RUN = re.compile(r'\w*\Z')  # \Z: $ would also match before a trailing newline
+RIGHT_RUN = re.compile(r'\w*')
+BULK_MERGE = 64  # New distinct words above which a re-sort beats repeated insort
+SHORT_PREFIX = 2  # Prefixes up to this long match too many words to rank on every keystroke
+CACHE_DEPTH = 32  # Ranked words kept per cached short prefix
+
+
+class WordIndex:
+    """Word frequencies of the buffer plus a sorted array for prefix lookups.
+
+    Kept up to date from edit deltas with `update`, never rebuilt from the
+    whole buffer. Short prefixes keep their best CACHE_DEPTH words ranked,
+    adjusted as counts change, so they don't rank thousands of words per
+    keystroke.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.words = []  # Distinct words, sorted
+        self._ranked = {}  # Short prefix -> (exhaustive, sorted [(-count, word)])
+
+    def clear(self):
+        self.counts = {}
+        self.words = []
+        self._ranked = {}
+
+    def _rerank(self, word):
+        # Keep each cached list the exact top of its prefix after `word`'s count changed
+        count = self.counts.get(word, 0)
+        key = (-count, word)
+        for length in range(1, min(SHORT_PREFIX, len(word)) + 1):
+            prefix = word[:length]
+            cached = self._ranked.get(prefix)
+            if cached is None:
+                continue
+            exhaustive, ranked = cached
+            for i, entry in enumerate(ranked):
+                if entry[1] == word:
+                    del ranked[i]
+                    break
+            if count and (exhaustive or (ranked and key < ranked[-1])):
+                bisect.insort(ranked, key)
+                if len(ranked) > CACHE_DEPTH:
+                    ranked.pop()
+                    self._ranked[prefix] = (False, ranked)
+            # A word that dropped below the last entry may have been overtaken by
+            # uncached ones, so it's left out; the list is still an exact top,
+            # just shorter, and complete() re-ranks once it runs short
+
+    def update(self, old_text, new_text):
+        """Replace the words found in `old_text` with those found in `new_text`"""
+        delta = Counter(WORD_PATTERN.findall(new_text))
+        delta.subtract(WORD_PATTERN.findall(old_text))
+        added = []
+        for word, change in delta.items():
+            if not change:
+                continue
+            if change > 0:
+                if word in self.counts:
+                    self.counts[word] += change
+                else:
+                    self.counts[word] = change
+                    added.append(word)
+            elif change < 0 and word in self.counts:
+                remaining = self.counts[word] + change
+                if remaining > 0:
+                    self.counts[word] = remaining
+                else:
+                    del self.counts[word]
+                    del self.words[bisect.bisect_left(self.words, word)]
+        if self._ranked:
+            for word, change in delta.items():
+                if change:
+                    self._rerank(word)
+        if len(added) > BULK_MERGE:
+            self.words.extend(added)
+            self.words.sort()
+        else:
+            for word in added:
+                bisect.insort(self.words, word)
+
+    def complete(self, prefix, k=10):
+        """Top `k` words starting with `prefix`, most frequent first"""
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX and k < CACHE_DEPTH:
+            cached = self._ranked.get(prefix)
+            if cached:
+                exhaustive, ranked = cached
+                words = [word for _, word in ranked if word != prefix][:k]
+                if exhaustive or len(words) == k:
+                    return words
+            ranked = self._rank(prefix, CACHE_DEPTH + 1)
+            self._ranked[prefix] = (len(ranked) <= CACHE_DEPTH, ranked[:CACHE_DEPTH])
+            return [word for _, word in ranked if word != prefix][:k]
+        return [word for _, word in self._rank(prefix, k + 1) if word != prefix][:k]
+
+    def _rank(self, prefix, k):
+        # The `k` best (-count, word) pairs among words starting with `prefix`
+        lo = bisect.bisect_left(self.words, prefix)
+        hi = bisect.bisect_left(self.words, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+        counts = self.counts
+        return heapq.nsmallest(k, ((-counts[word], word) for word in self.words[lo:hi]))
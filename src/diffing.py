@@ -0,0 +1,213 @@
+import bisect
+
+# Edit cost after which the middle-snake search settles for a good-enough split,
+# so heavily rewritten files stay fast at the price of a non-minimal diff
+MAX_COST = 64
+# Diagonal steps one diff may spend in middle-snake searches in all. Inputs
+# without structure (no unique lines, everything rearranged) only make about
+# MAX_COST lines of progress per search; past this the rest is reported as
+# changed rather than searched
+MAX_WORK = 1000000
+
+
+def intern_lines(a_lines, b_lines):
+    """Map every distinct line to a small integer so the diff only compares ints"""
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi):
+    """Find the middle snake of a shortest edit script (Myers 1986, linear space).
+
+    Returns the snake as absolute (x0, y0, x1, y1, d); a[x0:x1] == b[y0:y1]
+    and d is the edit cost the search went to.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    limit = (n + m + 1) // 2 + 1
+    # Diagonals only reach +-(d + 1) and d stops at MAX_COST, so the arrays
+    # don't need to span the whole problem
+    offset = min(limit, MAX_COST + 2)
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+    for d in range(limit):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            start = x
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + backward[offset + delta - k] >= n:
+                return alo + start, blo + start - k, alo + x, blo + y, d
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            start = x
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return alo + n - x, blo + m - y, alo + n - start, blo + m - start + k, d
+        if d >= MAX_COST:
+            # Too costly: split at the furthest point the forward search
+            # reached that is still inside the grid
+            best = max((k for k in range(-d, d + 1, 2)
+                        if forward[offset + k] <= n and 0 <= forward[offset + k] - k <= m),
+                       key=lambda k: 2 * forward[offset + k] - k)
+            x = forward[offset + best]
+            return alo + x, blo + x - best, alo + x, blo + x - best, d
+    raise AssertionError("no middle snake found")
+
+
+def _matched_pairs(a, b, budget):
+    # Divide and conquer on the middle snake, with an explicit stack. `budget`
+    # is a one-item list of diagonal steps left, shared by every gap of a diff
+    pairs = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            pairs.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            pairs.append((ahi, bhi))
+        if alo == ahi or blo == bhi or budget[0] <= 0:
+            continue
+        x0, y0, x1, y1, d = _middle_snake(a, alo, ahi, b, blo, bhi)
+        budget[0] -= (d + 1) * (d + 2)
+        pairs.extend(zip(range(x0, x1), range(y0, y1)))
+        stack.append((alo, x0, blo, y0))
+        stack.append((x1, ahi, y1, bhi))
+    pairs.sort()
+    return pairs
+
+
+def unique_anchors(a, b):
+    """(i, j) pairs of lines occurring once on each side, longest in-order subset.
+
+    The patience diff anchors: lines between two anchors can only match lines
+    between the same two anchors on the other side, so moved or reversed blocks
+    split into small independent gaps instead of one huge Myers search.
+    """
+    counts = {}
+    for line in a:
+        counts[line] = counts.get(line, 0) + 1
+    unique_a = {line: i for i, line in enumerate(a) if counts[line] == 1}
+    b_counts = {}
+    for line in b:
+        b_counts[line] = b_counts.get(line, 0) + 1
+    candidates = sorted((unique_a[line], j) for j, line in enumerate(b)
+                        if b_counts[line] == 1 and line in unique_a)
+    # Longest increasing run of j (patience sorting), ordered by i
+    tails = []  # tails[n] is the candidate ending the best run of length n + 1
+    tail_js = []  # ...and its j, for bisecting
+    previous = []
+    for index, (_, j) in enumerate(candidates):
+        n = bisect.bisect_left(tail_js, j)
+        previous.append(tails[n - 1] if n else -1)
+        if n == len(tails):
+            tails.append(index)
+            tail_js.append(j)
+        else:
+            tails[n] = index
+            tail_js[n] = j
+    anchors = []
+    index = tails[-1] if tails else -1
+    while index != -1:
+        anchors.append(candidates[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _gap_pairs(a, alo, ahi, b, blo, bhi, budget):
+    # Lines that never occur on the other side of the gap can't match; dropping
+    # them first keeps the edit distance (and so the Myers running time) small
+    if alo == ahi or blo == bhi:
+        return []
+    in_b = set(b[blo:bhi])
+    in_a = set(a[alo:ahi])
+    a_index = [i for i in range(alo, ahi) if a[i] in in_b]
+    b_index = [j for j in range(blo, bhi) if b[j] in in_a]
+    pairs = _matched_pairs([a[i] for i in a_index], [b[j] for j in b_index], budget)
+    return [(a_index[fi], b_index[fj]) for fi, fj in pairs]
+
+
+def matching_blocks(a, b):
+    """(i, j, size) runs where a[i:i+size] == b[j:j+size], in order"""
+    pairs = []
+    budget = [MAX_WORK]
+    i = j = 0
+    for ai, bj in unique_anchors(a, b) + [(len(a), len(b))]:
+        pairs.extend(_gap_pairs(a, i, ai, b, j, bj, budget))
+        pairs.append((ai, bj))
+        i, j = ai + 1, bj + 1
+    pairs.pop()  # The end sentinel
+    blocks = []
+    for i, j in pairs:
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1][2] += 1
+        else:
+            blocks.append([i, j, 1])
+    return [tuple(block) for block in blocks]
+
+
+def opcodes(a_lines, b_lines):
+    """difflib-style (tag, i1, i2, j1, j2) opcodes turning a_lines into b_lines"""
+    a, b = intern_lines(a_lines, b_lines)
+    codes = []
+    i = j = 0
+    for ai, bj, size in matching_blocks(a, b) + [(len(a), len(b), 0)]:
+        if i < ai and j < bj:
+            codes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            codes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            codes.append(('insert', i, ai, j, bj))
+        if size:
+            codes.append(('equal', ai, ai + size, bj, bj + size))
+        i, j = ai + size, bj + size
+    return codes
+
+
+def group_hunks(codes, context=3):
+    """Split opcodes into hunks of changes with up to `context` equal lines around them"""
+    hunks = []
+    current = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag != 'equal':
+            current.append((tag, i1, i2, j1, j2))
+            continue
+        if not current:
+            # Leading context for the next hunk
+            current_start = max(i1, i2 - context)
+            current = [('equal', current_start, i2, j2 - (i2 - current_start), j2)]
+            continue
+        if i2 - i1 > 2 * context:
+            current.append(('equal', i1, i1 + context, j1, j1 + context))
+            hunks.append(current)
+            current = [('equal', i2 - context, i2, j2 - context, j2)]
+        else:
+            current.append((tag, i1, i2, j1, j2))
+    if current and any(code[0] != 'equal' for code in current):
+        if current[-1][0] == 'equal':
+            tag, i1, i2, j1, j2 = current[-1]
+            current[-1] = (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+        hunks.append(current)
+    return [[code for code in hunk if code[1] != code[2] or code[3] != code[4]] for hunk in hunks]
@@ -0,0 +1,124 @@
+class FenwickTree:
+    """Prefix sums over a list of numbers with O(log n) point updates"""
+
+    def __init__(self, values=()):
+        tree = [0]
+        tree.extend(values)
+        # Linear-time build: push each node's total up to its parent
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, position, delta):
+        """Add `delta` to the value at 0-based `position`"""
+        i = position + 1
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def search(self, count):
+        """(position, rest): the 0-based value the `count`th unit (0-based) falls
+        in and how far into it, assuming no value is negative"""
+        tree = self.tree
+        position = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            following = position + step
+            if following < len(tree) and tree[following] <= count:
+                position = following
+                count -= tree[following]
+            step >>= 1
+        return position, count
+
+    def prefix(self, count):
+        """Sum of the first `count` values"""
+        total = 0
+        tree = self.tree
+        while count > 0:
+            total += tree[count]
+            count -= count & -count
+        return total
+
+
+import re
+
+# Runs of non-space characters touching an edit; count_words can only change inside them
+LEFT_RUN = re.compile(r'\S*\Z')
+RIGHT_RUN = re.compile(r'\S*')
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class DocumentStats:
+    """Word and character counts of a buffer, kept up to date from edit deltas.
+
+    Words are cached per line in blocks of about BLOCK_SIZE lines, with
+    Fenwick trees over the blocks' line counts and word totals. An edit
+    inside one block costs O(log n) plus its own lines; only splitting or
+    merging blocks rebuilds the trees, which are one entry per block.
+    """
+
+    BLOCK_SIZE = 512
+
+    def __init__(self):
+        self.blocks = [[0]]  # Word count of each line, in runs of consecutive lines
+        self.words = 0
+        self.chars = 0
+        self._rebuild()
+
+    def _rebuild(self):
+        self._lengths = FenwickTree(len(block) for block in self.blocks)
+        self._sums = FenwickTree(sum(block) for block in self.blocks)
+
+    def replace_lines(self, first, last, new_lines):
+        """Lines first..last (1-based, inclusive) now read as `new_lines`"""
+        counts = [count_words(line) for line in new_lines]
+        first_block, first_offset = self._lengths.search(first - 1)
+        last_block, last_offset = self._lengths.search(last - 1)
+        blocks = self.blocks
+        if first_block == last_block and len(counts) == last - first + 1:
+            block = blocks[first_block]
+            delta = sum(counts) - sum(block[first_offset:last_offset + 1])
+            block[first_offset:last_offset + 1] = counts
+            self.words += delta
+            self._sums.add(first_block, delta)
+            return
+        old = blocks[first_block:last_block + 1]
+        merged = old[0][:first_offset] + counts + old[-1][last_offset + 1:]
+        self.words += sum(merged) - sum(sum(block) for block in old)
+        if len(merged) <= 2 * self.BLOCK_SIZE:
+            new_blocks = [merged]
+        else:
+            new_blocks = [merged[i:i + self.BLOCK_SIZE]
+                          for i in range(0, len(merged), self.BLOCK_SIZE)]
+        blocks[first_block:last_block + 1] = new_blocks
+        if len(old) == 1 and len(new_blocks) == 1:
+            self._lengths.add(first_block, len(merged) - len(old[0]))
+            self._sums.add(first_block, sum(merged) - sum(old[0]))
+        else:
+            self._rebuild()
+
+    def add_words(self, line, delta):
+        """Line `line` (1-based) gained `delta` words without its text being recounted"""
+        block, offset = self._lengths.search(line - 1)
+        self.blocks[block][offset] += delta
+        self._sums.add(block, delta)
+        self.words += delta
+
+    def _words_before(self, count):
+        # Words on the first `count` lines
+        if count <= 0:
+            return 0
+        block, offset = self._lengths.search(count - 1)
+        return self._sums.prefix(block) + sum(self.blocks[block][:offset + 1])
+
+    def words_in_lines(self, first, last):
+        """Words on lines first..last (1-based, inclusive)"""
+        if last < first:
+            return 0
+        return self._words_before(last) - self._words_before(first - 1)
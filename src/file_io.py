@@ -0,0 +1,168 @@
+import codecs
+import locale
+from contextlib import contextmanager
+import os
+import shutil
+
+CHUNK_SIZE = 64 * 1024  # Bytes decoded (and encoded) at a time
+
+# Longest BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+NEWLINE_NAMES = {'\n': 'LF', '\r\n': 'CRLF', '\r': 'CR'}
+
+
+class FileFormat:
+    """How a file is stored on disk, so it can be written back the same way"""
+
+    def __init__(self, encoding='utf-8', bom=b'', newline=os.linesep):
+        self.encoding = encoding
+        self.bom = bom
+        self.newline = newline
+
+    def describe(self):
+        name = codecs.lookup(self.encoding).name.upper()
+        if self.bom:
+            name += ' BOM'
+        return f"{name}, {NEWLINE_NAMES[self.newline]}"
+
+
+def detect_newline(text, final=True):
+    """The line ending `text` uses, or None if it can't tell yet.
+
+    Unless `final`, a '\r' at the very end may be the first half of a '\r\n'
+    whose '\n' is still to come, so it decides nothing.
+    """
+    index = text.find('\n')
+    if index > 0 and text[index - 1] == '\r':
+        return '\r\n'
+    if index >= 0:
+        return '\n'
+    index = text.find('\r')
+    if index >= 0 and (final or index < len(text) - 1):
+        return '\r'
+    return None
+
+
+def _decodes(block, encoding, final):
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(block, final)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+def sniff(path):
+    """Guess the FileFormat of `path`.
+
+    The encoding comes from the first block; the newline style from the first
+    line ending, however far in that is (minified files can have one huge
+    first line).
+    """
+    with open(path, 'rb') as file:
+        block = file.read(CHUNK_SIZE)
+        final = len(block) < CHUNK_SIZE
+        file_format = _sniff_encoding(block, final)
+        decoder = codecs.getincrementaldecoder(file_format.encoding)(errors='surrogateescape')
+        text = decoder.decode(block[len(file_format.bom):], final)
+        while True:
+            newline = detect_newline(text, final)
+            if newline or final:
+                break
+            block = file.read(CHUNK_SIZE)
+            final = not block
+            # Only a trailing '\r' can still matter
+            text = text[-1:] + decoder.decode(block, final)
+    file_format.newline = newline or file_format.newline
+    return file_format
+
+
+def _sniff_encoding(block, final):
+    for bom, encoding in BOMS:
+        if block.startswith(bom):
+            file_format = FileFormat(encoding, bom)
+            break
+    else:
+        encoding = 'utf-8'
+        if not _decodes(block, 'utf-8', final):
+            # Legacy files: the platform encoding if it fits, else latin-1 (never fails)
+            encoding = locale.getpreferredencoding(False)
+            if not _decodes(block, encoding, final):
+                encoding = 'latin-1'
+        file_format = FileFormat(encoding)
+    return file_format
+
+
+def read_chunks(path, file_format, chunk_size=CHUNK_SIZE):
+    """Yield the decoded text of `path` a chunk at a time with newlines as '\\n'.
+
+    The encoding is only guessed from the first block, so bytes further on that
+    don't decode are carried as lone surrogates (surrogateescape) and
+    write_chunks puts the same bytes back.
+    """
+    decoder = codecs.getincrementaldecoder(file_format.encoding)(errors='surrogateescape')
+    with open(path, 'rb') as file:
+        file.seek(len(file_format.bom))
+        held = ''
+        while True:
+            raw = file.read(chunk_size)
+            final = not raw
+            text = held + decoder.decode(raw, final)
+            del raw  # Don't keep the raw bytes alive while the text is consumed
+            held = ''
+            # A '\r' at the end may be the first half of a '\r\n' split across chunks
+            if not final and text.endswith('\r'):
+                text, held = text[:-1], '\r'
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            if text:
+                yield text
+            if final:
+                return
+
+
+def decode(data, file_format):
+    # One-off decode of bytes appended to a file already in the buffer
+    text = data.decode(file_format.encoding, errors='surrogateescape')
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+@contextmanager
+def replacing(path, mode='w', keep_mode=False, **open_args):
+    """Open a temporary file that replaces `path` only once the block completes.
+
+    A failed write leaves the original untouched and the temporary file
+    removed. With `keep_mode` the new file keeps the old one's permissions.
+    """
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, mode, **open_args) as file:
+            yield file
+        if keep_mode and os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_chunks(path, chunks, file_format):
+    """Encode `chunks` to `path` in the file's original encoding and line endings.
+
+    Goes through a temporary file so a failed encode never truncates the
+    original. Bytes read_chunks couldn't decode are written back unchanged.
+    """
+    encoder = codecs.getincrementalencoder(file_format.encoding)(errors='surrogateescape')
+    with replacing(path, 'wb', keep_mode=True) as file:
+        file.write(file_format.bom)
+        for chunk in chunks:
+            if file_format.newline != '\n':
+                chunk = chunk.replace('\n', file_format.newline)
+            file.write(encoder.encode(chunk))
+        file.write(encoder.encode('', True))
@@ -0,0 +1,179 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+import diffing
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+TAIL_WINDOW = 64 * 1024  # Bytes before the old end compared to make sure a grown file was only appended to
+
+
+def _load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def split_lines(text):
+    """Split on '\n' only, keeping the endings (str.splitlines also breaks on \f, \u2028, ...)"""
+    lines = text.split('\n')
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def line_hunks(old_lines, new_lines):
+    """Return (i1, i2, j1, j2) hunks where old_lines[i1:i2] became new_lines[j1:j2]"""
+    return [(i1, i2, j1, j2) for tag, i1, i2, j1, j2 in diffing.opcodes(old_lines, new_lines)
+            if tag != 'equal']
+
+
+class FileWatcher:
+    """Notices when the open file is changed by another process.
+
+    Uses inotify on the file's directory when available (so editors that save
+    by renaming are still seen) and falls back to comparing mtime and size.
+    `check()` never blocks, so it can be called from a Tk `after` loop.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.signature = None
+        self._identity = None  # (st_dev, st_ino) as of `signature`
+        self._tail = b''  # The last TAIL_WINDOW bytes as of `signature`
+        self._pending = False  # inotify reported a change not yet synced or reloaded
+        self._fd = None
+        self._libc = _load_inotify()
+
+    def watch(self, path):
+        self.stop()
+        self.path = path
+        self.sync()
+        if self._libc is None:
+            return
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        if self._libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+            os.close(fd)
+            return
+        self._fd = fd
+
+    def stop(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.path = None
+        self.signature = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def sync(self):
+        """Remember the file as it is on disk now (after an open, save or reload)"""
+        self._drain()
+        self.signature = self._stat()
+        self._pending = False
+        self._identity = None
+        self._tail = b''
+        if self.signature:
+            size = self.signature[1]
+            try:
+                with open(self.path, 'rb') as file:
+                    st = os.fstat(file.fileno())
+                    self._identity = (st.st_dev, st.st_ino)
+                    file.seek(max(0, size - TAIL_WINDOW))
+                    self._tail = file.read(size - max(0, size - TAIL_WINDOW))
+            except OSError:
+                pass
+
+    def _drain(self):
+        # Read all pending events; True if any of them concerned our file
+        if self._fd is None:
+            return False
+        name = os.fsencode(os.path.basename(self.path or ''))
+        touched = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return touched
+            except OSError:
+                return True
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                event_name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW or event_name == name:
+                    touched = True
+
+    def check(self):
+        """Return True when the file changed on disk since the last sync"""
+        if self.path is None:
+            return False
+        if self._fd is not None:
+            # Draining consumes the events, so remember them until the change
+            # is synced; otherwise declining a reload would never ask again
+            if self._drain():
+                self._pending = True
+            if not self._pending:
+                return False
+        signature = self._stat()
+        changed = signature is not None and signature != self.signature
+        if not changed:
+            self._pending = False
+        return changed
+
+    def read_appended(self):
+        """Bytes appended since the last sync, or None if the file changed otherwise.
+
+        The file must be the same inode, must have grown, and the TAIL_WINDOW
+        bytes before the old end must be unchanged; anything else (a rewrite,
+        a rename-save, a truncation) falls back to a full reload. The cost is
+        bounded by the window plus the new data, however big the log gets.
+        """
+        if not self.signature or self._identity is None:
+            return None
+        old_size = self.signature[1]
+        try:
+            with open(self.path, 'rb') as file:
+                st = os.fstat(file.fileno())
+                if (st.st_dev, st.st_ino) != self._identity or st.st_size <= old_size:
+                    return None
+                file.seek(old_size - len(self._tail))
+                if file.read(len(self._tail)) != self._tail:
+                    return None
+                data = file.read()
+        except OSError:
+            return None
+        self.signature = (st.st_mtime_ns, old_size + len(data))
+        self._tail = (self._tail + data)[-TAIL_WINDOW:]
+        self._pending = False
+        return data
@@ -0,0 +1,187 @@
+import fnmatch
+import mmap
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+IGNORED_DIRS = {'.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', 'venv',
+                '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache'}
+BINARY_SNIFF = 8192  # A NUL byte in this many leading bytes marks a file as binary
+BATCH_SIZE = 64  # Files per pool task; keeps pickling overhead low on big trees
+MAX_HITS_PER_FILE = 1000
+PREVIEW_LENGTH = 200
+
+
+def load_ignore_patterns(root):
+    """Glob patterns from the root .gitignore (negations aren't supported)"""
+    patterns = []
+    try:
+        with open(os.path.join(root, '.gitignore'), 'r', encoding='utf-8', errors='replace') as file:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith(('#', '!')):
+                    patterns.append(line.strip('/'))
+    except OSError:
+        pass
+    return patterns
+
+
+def _ignored(name, relative, patterns):
+    for pattern in patterns:
+        target = relative if '/' in pattern else name
+        if fnmatch.fnmatch(target, pattern):
+            return True
+    return False
+
+
+def walk_files(root, patterns):
+    """Yield the files under `root`, pruning ignored directories as we go"""
+    for directory, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(directory, root).replace(os.sep, '/')
+        if relative_dir == '.':
+            relative_dir = ''
+        dirnames[:] = [name for name in dirnames
+                       if name not in IGNORED_DIRS and
+                       not _ignored(name, f"{relative_dir}/{name}".lstrip('/'), patterns)]
+        for name in filenames:
+            if not _ignored(name, f"{relative_dir}/{name}".lstrip('/'), patterns):
+                yield os.path.join(directory, name)
+
+
+_compiled = {}
+
+
+def _regex(pattern, flags):
+    # Each worker process compiles a pattern once and reuses it for every file
+    key = (pattern, flags)
+    if key not in _compiled:
+        _compiled[key] = re.compile(pattern, flags)
+    return _compiled[key]
+
+
+def search_file(path, pattern, flags):
+    """Return (line, column, preview) for each line of `path` that matches"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.find(b'\0', 0, BINARY_SNIFF) != -1:
+                return []
+            regex = _regex(pattern, flags)
+            hits = []
+            line = 1
+            counted = 0
+            position = 0
+            while len(hits) < MAX_HITS_PER_FILE:
+                match = regex.search(data, position)
+                if not match:
+                    break
+                start = match.start()
+                line += data[counted:start].count(b'\n')
+                counted = start
+                line_start = data.rfind(b'\n', 0, start) + 1
+                line_end = data.find(b'\n', start)
+                if line_end == -1:
+                    line_end = len(data)
+                column = len(data[line_start:start].decode('utf-8', 'replace'))
+                preview = data[line_start:min(line_end, line_start + PREVIEW_LENGTH)]
+                hits.append((line, column, preview.decode('utf-8', 'replace').strip()))
+                # One hit per line: carry on from the next line, if there is one
+                # (an empty match would otherwise keep hitting at EOF)
+                position = line_end + 1
+                if position >= len(data):
+                    break
+            return hits
+
+
+def search_batch(paths, pattern, flags):
+    results = []
+    for path in paths:
+        try:
+            hits = search_file(path, pattern, flags)
+        except (OSError, ValueError):
+            continue
+        if hits:
+            results.append((path, hits))
+    return results
+
+
+class FileSearch:
+    """Searches a directory tree in a process pool, streaming results as batches finish.
+
+    A background thread walks the tree and submits batches of files; finished
+    batches land in `results`, which the UI drains with `poll()`.
+    """
+
+    def __init__(self, root, text, use_regex=False, match_case=False):
+        pattern = text.encode('utf-8')
+        if not use_regex:
+            pattern = re.escape(pattern)
+        self.pattern = pattern
+        self.flags = re.MULTILINE | (0 if match_case else re.IGNORECASE)
+        re.compile(self.pattern, self.flags)  # Surface bad patterns before starting
+        self.root = root
+        self.results = queue.Queue()
+        self.files_searched = 0
+        self.cancelled = False
+        self._pending = 0
+        self._walking = True
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor()
+
+    def start(self):
+        threading.Thread(target=self._submit_batches, daemon=True).start()
+
+    def _submit_batches(self):
+        patterns = load_ignore_patterns(self.root)
+        batch = []
+        try:
+            for path in walk_files(self.root, patterns):
+                if self.cancelled:
+                    return
+                batch.append(path)
+                if len(batch) >= BATCH_SIZE:
+                    self._submit(batch)
+                    batch = []
+            if batch:
+                self._submit(batch)
+        except RuntimeError:
+            # The pool was shut down by cancel() mid-walk
+            return
+        finally:
+            self._walking = False
+
+    def _submit(self, batch):
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(search_batch, batch, self.pattern, self.flags)
+        future.add_done_callback(lambda f, count=len(batch): self._finished(f, count))
+
+    def _finished(self, future, count):
+        if not future.cancelled() and future.exception() is None:
+            self.results.put(future.result())
+        with self._lock:
+            self._pending -= 1
+            self.files_searched += count
+
+    def poll(self):
+        """Return the (path, hits) pairs that finished since the last call"""
+        found = []
+        while True:
+            try:
+                found.extend(self.results.get_nowait())
+            except queue.Empty:
+                return found
+
+    def done(self):
+        with self._lock:
+            return self.cancelled or (not self._walking and self._pending == 0)
+
+    def cancel(self):
+        self.cancelled = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
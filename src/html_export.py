@@ -0,0 +1,60 @@
+import html
+import file_io
+
+STYLE_PROPERTIES = (
+    ('family', 'font-family', lambda value: f"'{value}', monospace"),
+    ('size', 'font-size', lambda value: f"{abs(value)}{'px' if value < 0 else 'pt'}"),
+    ('weight', 'font-weight', str),
+    ('slant', 'font-style', lambda value: 'italic' if value == 'italic' else 'normal'),
+    ('underline', 'text-decoration', lambda value: 'underline' if value else 'none'),
+)
+
+
+def stylesheet(theme, highlight_tags, tag_fonts):
+    """CSS for the exported page: colours from the theme, fonts from the style tags.
+
+    `tag_fonts` maps a style tag to its font attributes as returned by
+    tkinter.font.Font.actual().
+    """
+    rules = [
+        f"body {{ background: {theme['bg']}; color: {theme['fg']}; }}",
+        "pre { white-space: pre-wrap; font-family: monospace; }",
+    ]
+    rules.extend(f".{tag} {{ color: {theme[tag]}; }}" for tag in highlight_tags)
+    for tag, font in tag_fonts.items():
+        declarations = ' '.join(f"{prop}: {convert(font[key])};"
+                                for key, prop, convert in STYLE_PROPERTIES if key in font)
+        rules.append(f".{tag} {{ {declarations} }}")
+    return '\n'.join(rules)
+
+
+def html_chunks(events, css, title, classes):
+    """Yield the page a piece at a time from Text.dump-style (key, value) events.
+
+    Each text run is wrapped in a span carrying every exported tag active over
+    it, so overlapping tags never need nesting.
+    """
+    yield ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+           f"<title>{html.escape(title)}</title>\n<style>\n{css}\n</style>\n</head>\n<body>\n<pre>")
+    active = []
+    for key, value in events:
+        if key == 'tagon':
+            if value in classes and value not in active:
+                active.append(value)
+        elif key == 'tagoff':
+            if value in active:
+                active.remove(value)
+        elif key == 'text':
+            text = html.escape(value, quote=False)
+            if active:
+                yield f"<span class=\"{' '.join(active)}\">{text}</span>"
+            else:
+                yield text
+    yield "</pre>\n</body>\n</html>\n"
+
+
+def write_html(path, chunks):
+    """Stream `chunks` to `path`, replacing it only once the export is complete"""
+    with file_io.replacing(path, 'w', encoding='utf-8') as file:
+        for chunk in chunks:
+            file.write(chunk)
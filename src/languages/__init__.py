@@ -0,0 +1,60 @@
+"""Syntax highlighting grammars, looked up by file extension.
+
+Each grammar module declares RULES, an ordered list of (tag, pattern) pairs
+(and optionally FLAGS). The rules are joined into one alternation regex with
+a named group per tag, so a single pass over the text finds every token; the
+first rule that matches at a position wins. Patterns must only use
+non-capturing groups. Modules are imported and compiled on first use.
+"""
+import importlib
+import os
+import re
+
+# Extension -> grammar module in this package
+EXTENSIONS = {
+    '.py': 'python', '.pyw': 'python',
+    '.json': 'json',
+    '.md': 'markdown', '.markdown': 'markdown',
+    '.sh': 'shell', '.bash': 'shell', '.zsh': 'shell',
+    '.c': 'c', '.h': 'c',
+}
+# Every tag a grammar may produce; each has a colour of the same name in the themes
+HIGHLIGHT_TAGS = ('keyword', 'string', 'comment', 'number', 'constant', 'directive',
+                  'key', 'variable', 'heading', 'emphasis')
+
+
+def words(*names):
+    """Pattern matching any of `names` as a whole word"""
+    return r'\b(?:' + '|'.join(names) + r')\b'
+
+
+class Grammar:
+    def __init__(self, name, pattern, tags):
+        self.name = name
+        self.pattern = pattern
+        self.tags = tags
+
+    def tokens(self, text, start=0, end=None):
+        """Yield (tag, start, end) for each token in text[start:end]"""
+        for match in self.pattern.finditer(text, start, len(text) if end is None else end):
+            yield match.lastgroup, match.start(), match.end()
+
+
+_grammars = {}
+
+
+def grammar_for(path):
+    """The compiled Grammar for `path`, or None if it's plain text"""
+    if not path:
+        return None
+    name = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if name is None:
+        return None
+    if name not in _grammars:
+        module = importlib.import_module(f"{__name__}.{name}")
+        for tag, _ in module.RULES:
+            assert tag in HIGHLIGHT_TAGS, tag
+        pattern = '|'.join(f"(?P<{tag}>{rule})" for tag, rule in module.RULES)
+        _grammars[name] = Grammar(name, re.compile(pattern, getattr(module, 'FLAGS', 0)),
+                                  tuple(tag for tag, _ in module.RULES))
+    return _grammars[name]
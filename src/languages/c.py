@@ -0,0 +1,17 @@
+import re
+
+from languages import words
+
+FLAGS = re.MULTILINE
+RULES = [
+    ('comment', r'//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)'),
+    ('directive', r'^[ \t]*#[ \t]*\w+'),
+    ('string', r'"(?:[^"\\\n]|\\[\s\S])*"?|\'(?:[^\'\\\n]|\\.)*\'?'),
+    ('constant', words('NULL', 'true', 'false', 'EOF', 'stdin', 'stdout', 'stderr')),
+    ('keyword', words('auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do',
+                      'double', 'else', 'enum', 'extern', 'float', 'for', 'goto', 'if', 'inline',
+                      'int', 'long', 'register', 'restrict', 'return', 'short', 'signed', 'sizeof',
+                      'static', 'struct', 'switch', 'typedef', 'union', 'unsigned', 'void',
+                      'volatile', 'while', 'bool')),
+    ('number', r'\b(?:0[xX][\da-fA-F]+|\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)[uUlLfF]*\b'),
+]
@@ -0,0 +1,9 @@
+from languages import words
+
+RULES = [
+    # A string followed by a colon is an object key
+    ('key', r'"(?:[^"\\\n]|\\.)*"(?=\s*:)'),
+    ('string', r'"(?:[^"\\\n]|\\.)*"?'),
+    ('number', r'-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b'),
+    ('constant', words('true', 'false', 'null')),
+]
@@ -0,0 +1,10 @@
+import re
+
+FLAGS = re.MULTILINE
+RULES = [
+    ('string', r'^[ \t]*```[\s\S]*?(?:^[ \t]*```[^\n]*|\Z)|`[^`\n]+`'),
+    ('heading', r'^#{1,6}[ \t][^\n]*|^[^\n]+\n(?:=+|-+)[ \t]*$'),
+    ('emphasis', r'\*\*[^*\n]+\*\*|__[^_\n]+__|\*[^*\n]+\*|\b_[^_\n]+_\b'),
+    ('key', r'!?\[[^\]\n]*\]\([^)\n]*\)'),
+    ('directive', r'^[ \t]*(?:[-*+]|\d+\.)[ \t]|^>[^\n]*'),
+]
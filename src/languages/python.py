@@ -0,0 +1,18 @@
+import re
+
+from languages import words
+
+FLAGS = re.MULTILINE
+RULES = [
+    ('comment', r'#[^\n]*'),
+    # Unterminated strings run to the end of the line (or buffer, for triple quotes)
+    ('string', r'(?:\b[rRbBuUfF]{1,2})?(?:"""[\s\S]*?(?:"""|\Z)|\'\'\'[\s\S]*?(?:\'\'\'|\Z)'
+               r'|"(?:[^"\\\n]|\\[\s\S])*"?|\'(?:[^\'\\\n]|\\[\s\S])*\'?)'),
+    ('directive', r'^[ \t]*@[\w.]+'),
+    ('constant', words('True', 'False', 'None')),
+    ('keyword', words('and', 'as', 'assert', 'async', 'await', 'break', 'class', 'continue',
+                      'def', 'del', 'elif', 'else', 'except', 'finally', 'for', 'from', 'global',
+                      'if', 'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass',
+                      'raise', 'return', 'try', 'while', 'with', 'yield')),
+    ('number', r'\b(?:0[xX][\da-fA-F_]+|0[oO][0-7_]+|0[bB][01_]+|\d[\d_]*(?:\.[\d_]*)?(?:[eE][+-]?\d+)?[jJ]?)'),
+]
@@ -0,0 +1,15 @@
+import re
+
+from languages import words
+
+FLAGS = re.MULTILINE
+RULES = [
+    ('directive', r'\A#![^\n]*'),
+    ('comment', r'(?:^|(?<=[ \t;]))#[^\n]*'),
+    ('string', r'"(?:[^"\\]|\\[\s\S])*"?|\'[^\']*\'?'),
+    ('variable', r'\$(?:\{[^}\n]*\}|\w+|[@*#?$!0-9-])'),
+    ('keyword', words('if', 'then', 'else', 'elif', 'fi', 'case', 'esac', 'for', 'select', 'while',
+                      'until', 'do', 'done', 'in', 'function', 'time', 'return', 'break', 'continue',
+                      'local', 'export', 'readonly', 'declare', 'source', 'exit', 'shift', 'trap')),
+    ('number', r'\b\d+\b'),
+]
@@ -5,6 +5,21 @@ import sys  # Add sys to detect the platform
 import themes  # Import the themes module
 import threading  # For autosave
 import time
+import hashlib
+import os
+import re
+import undo_manager
+import file_watcher
+import file_io
+import outline
+import completion
+import find_in_files
+import diffing
+import session
+import tag_batch
+import languages
+import doc_stats
+import html_export
 
 # Check for spell checker availability
 try:
@@ -15,6 +30,25 @@ except ImportError:
 
 class TextEditor:
     SPELL_CHECK_ENABLED = SPELL_CHECK_ENABLED  # Class attribute
+    LONG_LINE_THRESHOLD = 10000  # Lines longer than this switch the editor into long-line mode
+    LONG_LINE_COLUMN_LIMIT = 2000  # Columns highlighted (and shown per chunk) in long-line mode
+    UNDO_MEMORY_LIMIT = 16 * 1024 * 1024  # Bytes of undo history kept before the oldest groups go
+    PASTE_CHUNK_SIZE = 64 * 1024  # Characters handed to Tk per insert during a paste
+    # Index modifiers that move every cursor for the arrow/Home/End keys
+    CURSOR_MOVES = {'Left': '-1c', 'Right': '+1c', 'Up': '-1 lines', 'Down': '+1 lines',
+                    'Home': 'linestart', 'End': 'lineend'}
+    WATCH_INTERVAL = 1000  # Milliseconds between checks for changes made by other programs
+    FIND_IN_FILES_LIMIT = 10000  # Results listed before a project search stops adding more
+    BACKUP_PATH = 'backup.txt'
+    DIFF_CONTEXT = 3  # Unchanged lines shown around each hunk
+    SESSION_INTERVAL = 60000  # Milliseconds between session snapshots
+    SESSION_STYLE_BATCH = 500  # Style runs re-applied per idle callback when restoring
+    COMPLETION_CONTEXT = 100  # Characters looked at either side of an edit or the cursor
+    COMPLETION_COUNT = 10  # Suggestions shown in the completion popup
+    # event.state bits of the modifiers that make a key a shortcut: Control, plus
+    # Alt, which is 0x20000 on Windows (where Mod1, 0x8, is NumLock) and Mod1
+    # elsewhere (Command on macOS)
+    SHORTCUT_STATE = 0x4 | (0x20000 if sys.platform == 'win32' else 0x8)
 
     def __init__(self, root):
         self.root = root
@@ -53,10 +87,69 @@ class TextEditor:
         self.root.grid_rowconfigure(0, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
         
+        # Path of the file currently in the buffer (None for a new file) and
+        # the encoding/line endings it is written back with
+        self.current_file = None
+        self.file_format = file_io.FileFormat()
+        self.grammar = None  # Highlighting grammar for the file type; None for plain text
+
         # Change the order: create text widgets before toolbar
         self.create_text_widgets()
         self.create_toolbar()
 
+        # Observe every edit and keep our own bounded undo history
+        self.install_edit_proxy()
+        self.undo_manager = undo_manager.UndoManager(
+            self.text_area.insert,
+            self.text_area.delete,
+            max_bytes=self.UNDO_MEMORY_LIMIT
+        )
+        self.edit_listeners.append(self.undo_manager.record)
+        self.persist_undo = tk.BooleanVar(value=False)
+
+        # Track unsaved edits and watch the open file for outside changes
+        self.buffer_dirty = False
+        self.edit_listeners.append(self.mark_dirty)
+        self.file_watcher = file_watcher.FileWatcher()
+        self.root.after(self.WATCH_INTERVAL, self.check_external_changes)
+
+        # Symbol outline for Python buffers, re-parsed per top-level block after edits
+        self.symbol_index = outline.SymbolIndex()
+        self._outline_dirty = None  # (first, last) lines waiting to be re-parsed
+        self._outline_full = False
+        self._outline_generation = 0
+        self._outline_job = None
+        self._outline_worker = None
+        self.edit_listeners.append(self.track_outline_edit)
+        self.create_outline_panel()
+
+        # Word completion over the buffer, indexed from edit deltas
+        self.word_index = completion.WordIndex()
+        self.edit_listeners.append(self.track_completion_words)
+        self.create_completion_popup()
+
+        # Live document statistics for the status bar, maintained from edit deltas
+        self.doc_stats = doc_stats.DocumentStats()
+        self.edit_listeners.append(self.track_stats_edit)
+        self.text_area.bind('<ButtonRelease>', self.update_stats_display, add='+')
+        self.text_area.bind('<<Selection>>', self.update_stats_display, add='+')
+
+        # Pastes go in as chunked bulk inserts and are analysed once afterwards
+        self._bulk_inserting = False
+        self._bulk_range = None  # (first, last) lines waiting for the post-insert pass
+        self._bulk_job = None
+        self._analysis_edited = False  # An edit happened since the last highlight pass
+        self._typing_tag = None  # Style tag toggle_style applies to typed characters
+        self.edit_listeners.append(self.track_typing_style)
+        self.text_area.bind('<<Paste>>', self.paste)
+
+        # Extra cursors for multi-cursor and column editing. Each cursor is a
+        # pair of marks, so it follows edits made anywhere else in the buffer
+        self.cursors = []  # (start mark, end mark) per cursor, primary first
+        self._cursor_serial = 0
+        self._column_anchor = None
+        self.create_multi_cursor_bindings()
+
         # Bind events
         self.bind_shortcuts()
         if sys.platform == 'darwin':
@@ -81,10 +174,24 @@ class TextEditor:
         self.bind_cursor_events()
         self.update_all_tags()
 
-        # Add these bindings
-        self.text_area.bind('<Return>', self.auto_indent)
-        self.text_area.bind('<Key>', self.match_brackets)
-        self.text_area.bind('<KeyRelease>', lambda e: self.highlight_syntax())
+        # Snapshot the session periodically and on exit, and pick up the last
+        # one once the window is up
+        self._session_data = None  # Last snapshot written, so unchanged ones are skipped
+        self._session_hash = None  # content_hash() of the saved buffer, dropped on edits
+        self._style_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close_window)
+        self.root.after(self.SESSION_INTERVAL, self.autosave_session)
+        self.root.after_idle(self.restore_session)
+
+        # Long-line mode keeps the visible chunk centred on the cursor
+        self.text_area.bind('<Key>', self.reveal_long_line_chunk, add='+')
+        self.text_area.bind('<KeyRelease>', self.reveal_long_line_chunk, add='+')
+        # <ButtonRelease>, like the stats and format-button handlers: a
+        # <ButtonRelease-1> binding would be the only one to run on a click
+        self.text_area.bind('<ButtonRelease>', self.reveal_long_line_chunk, add='+')
+
+        # Clicking somewhere else starts a new undo group
+        self.text_area.bind('<ButtonRelease>', lambda e: self.undo_manager.break_group(), add='+')
 
     def create_text_widgets(self):
         self.text_frame = ttk.Frame(self.main_frame)
@@ -101,7 +208,7 @@ class TextEditor:
         # Create line numbers with better sizing
         self.line_numbers = tk.Text(
             self.text_frame_inner,
-            width=5,
+            width=7,  # Room for the fold marker
             padx=4,
             pady=4,
             takefocus=0,
@@ -112,12 +219,15 @@ class TextEditor:
             wrap='none'
         )
         self.line_numbers.grid(row=0, column=0, sticky='ns')
+        self._numbered_lines = 0  # Line count the gutter was last drawn for
+        # Clicking a line number folds or unfolds the block it starts
+        self.line_numbers.bind('<Button-1>', self.toggle_fold_from_gutter)
         
         # Create text area with better spacing
         self.text_area = tk.Text(
             self.text_frame_inner,
             wrap='word',
-            undo=True,
+            undo=False,  # History is kept by UndoManager
             font=self.text_font,
             padx=8,
             pady=8,
@@ -137,6 +247,22 @@ class TextEditor:
         )
         self.scrollbar.grid(row=0, column=2, sticky='ns')
         self.text_area.config(yscrollcommand=self.scrollbar.set)
+
+        # Horizontal scrollbar, only shown in long-line mode (wrap disabled)
+        self.h_scrollbar = ttk.Scrollbar(
+            self.text_frame_inner,
+            orient='horizontal',
+            command=self.text_area.xview
+        )
+        self.text_area.config(xscrollcommand=self.h_scrollbar.set)
+
+        # Long-line mode state; the tail tag hides text Tk would otherwise lay out
+        self.long_line_mode = False
+        self.chunk_long_lines = tk.BooleanVar(value=True)
+        self.text_area.tag_configure('long_line_tail', elide=True)
+
+        # Folded blocks are elided: Tk doesn't lay them out and text searches skip them
+        self.text_area.tag_configure('folded', elide=True)
         
         # Create status bar with better styling
         self.status_bar = ttk.Label(
@@ -146,7 +272,8 @@ class TextEditor:
             style='Status.TLabel'
         )
         
-        # Bind events
+        # Bind events (on_key_release is the single <KeyRelease> handler; the
+        # other handlers for an event are chained with add='+')
         self.text_area.bind('<KeyRelease>', self.on_key_release)
         self.text_area.bind('<Return>', self.auto_indent)
         self.text_area.bind('<Key>', self.match_brackets)
@@ -155,12 +282,14 @@ class TextEditor:
         self.text_area.bind('<Configure>', lambda e: self.sync_scroll())
 
         # Add font control update bindings
-        self.text_area.bind('<Button-1>', self.update_font_controls)
-        self.text_area.bind('<KeyRelease>', self.update_font_controls)
+        self.text_area.bind('<Button-1>', self.update_font_controls, add='+')
         self.text_area.bind('<<Selection>>', self.update_font_controls)
 
         # Create status bar and place it at the bottom
         self.status_bar.grid(row=2, column=0, sticky='ew')
+        # Cursor position and document counts sit at its right-hand end
+        self.stats_label = ttk.Label(self.text_frame, text="", anchor='e', style='Status.TLabel')
+        self.stats_label.grid(row=2, column=1, sticky='e')
 
     def create_toolbar(self):
         # Create toolbar frame
@@ -250,6 +379,10 @@ class TextEditor:
         file_menu.add_command(label="New", command=self.new_file, accelerator=accel_new)
         file_menu.add_command(label="Open", command=self.open_file, accelerator=accel_open)
         file_menu.add_command(label="Save", command=self.save_file, accelerator=accel_save)
+        file_menu.add_command(label="Export as HTML...", command=self.export_html)
+        file_menu.add_separator()
+        file_menu.add_command(label="Compare with Saved", command=self.compare_with_saved)
+        file_menu.add_command(label="Compare with Backup", command=self.compare_with_backup)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.quit_app, accelerator=accel_exit)
         menu_bar.add_cascade(label="File", menu=file_menu)
@@ -265,12 +398,37 @@ class TextEditor:
             accel_replace = 'Cmd+H'
         edit_menu.add_command(label="Find", command=self.find_text, accelerator=accel_find)
         edit_menu.add_command(label="Replace", command=self.replace_text, accelerator=accel_replace)
+        accel_symbol = 'Cmd+R' if sys.platform == 'darwin' else 'Ctrl+R'
+        accel_files = 'Cmd+Shift+F' if sys.platform == 'darwin' else 'Ctrl+Shift+F'
+        edit_menu.add_command(label="Find in Files", command=self.find_in_files, accelerator=accel_files)
+        edit_menu.add_command(label="Go to Symbol", command=self.goto_symbol, accelerator=accel_symbol)
+        edit_menu.add_separator()
+        accel_next = 'Cmd+D' if sys.platform == 'darwin' else 'Ctrl+D'
+        edit_menu.add_command(label="Add Cursor at Next Occurrence", command=self.add_cursor_at_next_occurrence,
+                              accelerator=accel_next)
+        edit_menu.add_command(label="Add Cursor Above", command=lambda: self.add_cursor_vertically(-1),
+                              accelerator='Alt+Shift+Up')
+        edit_menu.add_command(label="Add Cursor Below", command=lambda: self.add_cursor_vertically(1),
+                              accelerator='Alt+Shift+Down')
+        edit_menu.add_command(label="Clear Extra Cursors", command=self.clear_cursors, accelerator='Esc')
+        edit_menu.add_separator()
+        edit_menu.add_checkbutton(label="Keep Undo History", variable=self.persist_undo)
         menu_bar.add_cascade(label="Edit", menu=edit_menu)
         
         # View Menu
         view_menu = tk.Menu(menu_bar, tearoff=0)
         view_menu.add_command(label="Light Theme", command=lambda: self.change_theme('default'))
         view_menu.add_command(label="Dark Theme", command=lambda: self.change_theme('dark'))
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Chunk Long Lines", variable=self.chunk_long_lines,
+                                  command=self.collapse_long_lines)
+        view_menu.add_checkbutton(label="Outline", variable=self.show_outline,
+                                  command=self.toggle_outline)
+        view_menu.add_separator()
+        view_menu.add_command(label="Fold Block", command=self.fold_block, accelerator='Ctrl+[')
+        view_menu.add_command(label="Unfold Block", command=self.unfold_block, accelerator='Ctrl+]')
+        view_menu.add_command(label="Fold All", command=self.fold_all)
+        view_menu.add_command(label="Unfold All", command=self.unfold_all)
         menu_bar.add_cascade(label="View", menu=view_menu)
         
         self.root.config(menu=menu_bar)
@@ -287,6 +445,11 @@ class TextEditor:
         self.root.bind('<Control-y>', lambda e: self.redo_edit())
         self.root.bind('<Control-f>', lambda e: self.find_text())
         self.root.bind('<Control-h>', lambda e: self.replace_text())
+        self.root.bind('<Control-r>', lambda e: self.goto_symbol())
+        self.root.bind('<Control-F>', lambda e: self.find_in_files())
+        self.text_area.bind('<Control-space>', lambda e: self.show_completions() or 'break')
+        self.text_area.bind('<Control-bracketleft>', lambda e: self.fold_block() or 'break')
+        self.text_area.bind('<Control-bracketright>', lambda e: self.unfold_block() or 'break')
 
     def bind_mac_shortcuts(self):
         self.root.bind('<Command-n>', lambda e: self.new_file())
@@ -295,20 +458,70 @@ class TextEditor:
         self.root.bind('<Command-q>', lambda e: self.quit_app())
         self.root.bind('<Command-z>', lambda e: self.undo_edit())
         self.root.bind('<Command-y>', lambda e: self.redo_edit())
+        self.root.bind('<Command-r>', lambda e: self.goto_symbol())
+        self.root.bind('<Command-F>', lambda e: self.find_in_files())
+        self.text_area.bind('<Command-space>', lambda e: self.show_completions() or 'break')
+        self.text_area.bind('<Command-bracketleft>', lambda e: self.fold_block() or 'break')
+        self.text_area.bind('<Command-bracketright>', lambda e: self.unfold_block() or 'break')
     
     def new_file(self):
+        self.cancel_style_restore()
+        self.clear_cursors()
         self.text_area.delete(1.0, tk.END)
+        self.set_long_line_mode(False)
+        self.current_file = None
+        self.file_format = file_io.FileFormat()
+        self.grammar = None
+        self.undo_manager.clear()
+        self.file_watcher.stop()
+        self.buffer_dirty = False
+        self.symbol_index.clear()
+        self.update_outline_panel()
+        self.update_line_numbers()
+        self.update_stats_display()
         self.status_bar.config(text="New File")
     
-    def open_file(self):
-        file_path = filedialog.askopenfilename()
+    def open_file(self, file_path=None):
+        if file_path is None:
+            file_path = filedialog.askopenfilename()
         if file_path:
             try:
-                with open(file_path, 'r') as file:
-                    self.text_area.delete(1.0, tk.END)
-                    self.text_area.insert(tk.END, file.read())
+                file_format = file_io.sniff(file_path)
+                self.cancel_style_restore()
+                self.clear_cursors()
+                self.symbol_index.clear()
+                self.set_long_line_mode(False)
+                self.text_area.delete(1.0, tk.END)
+                self.word_index.clear()
+                long_lines = []
+                line, carry = 1, 0
+                for chunk in file_io.read_chunks(file_path, file_format):
+                    found, line, carry = self.find_long_lines(chunk, line, carry)
+                    if found:
+                        # Switch layout mode before inserting so Tk never wraps a huge line
+                        long_lines.extend(found)
+                        self.set_long_line_mode(True)
+                    self.text_area.insert(tk.END, chunk)
+                self.collapse_long_lines(long_lines)
+                self.current_file = file_path
+                self.file_format = file_format
+                self.grammar = languages.grammar_for(file_path)
+                self.undo_manager.clear()
+                if self.persist_undo.get():
+                    self.undo_manager.load(undo_manager.history_path(file_path), self.content_hash())
+                self.file_watcher.watch(file_path)
+                self.buffer_dirty = False
+                self.update_outline_panel()
+                self.update_line_numbers()
+                self.highlight_syntax()
+                self.update_stats_display()
+                if self.is_python_buffer():
+                    self.schedule_outline_refresh(full=True)
                 self.root.title(f"✍️ Simple Text Editor - {file_path}")
-                self.status_bar.config(text=f"Opened: {file_path}")
+                details = file_format.describe()
+                if self.long_line_mode:
+                    details += ", long-line mode"
+                self.status_bar.config(text=f"Opened: {file_path} ({details})")
             except Exception as e:
                 messagebox.showerror("Error", f"Could not open file: {str(e)}")
     
@@ -318,17 +531,747 @@ class TextEditor:
             filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
         )
         if file_path:
+            # Don't silently overwrite changes another program made to the open file
+            if file_path == self.current_file and self.file_watcher.check():
+                if not messagebox.askyesno(
+                        "File Changed",
+                        f"'{file_path}' was changed by another program.\n\nOverwrite it anyway?"):
+                    return
             try:
-                with open(file_path, 'w') as file:
-                    file.write(self.text_area.get(1.0, tk.END))
+                try:
+                    file_io.write_chunks(file_path, self.iter_buffer_chunks(), self.file_format)
+                except UnicodeEncodeError as e:
+                    # A legacy encoding sniffed on open can't hold everything typed since
+                    if not messagebox.askyesno(
+                            "Encoding",
+                            f"The text can't be saved as {self.file_format.encoding}: "
+                            f"{e.object[e.start:e.end]!r} has no encoding in it.\n\nSave it as UTF-8 instead?"):
+                        self.status_bar.config(text="Save cancelled")
+                        return
+                    self.file_format = file_io.FileFormat('utf-8', newline=self.file_format.newline)
+                    file_io.write_chunks(file_path, self.iter_buffer_chunks(), self.file_format)
+                self.current_file = file_path
+                self.grammar = languages.grammar_for(file_path)
+                self.highlight_syntax()
+                # Saving under a new name can make the buffer Python (or stop it being)
+                if self.is_python_buffer():
+                    self.schedule_outline_refresh(full=True)
+                else:
+                    self.symbol_index.clear()
+                    self.update_outline_panel()
+                self.file_watcher.watch(file_path)
+                self.buffer_dirty = False
+                if self.persist_undo.get():
+                    self.undo_manager.save(undo_manager.history_path(file_path), self.content_hash())
                 self.root.title(f"✍️ Simple Text Editor - {file_path}")
-                self.status_bar.config(text=f"Saved: {file_path}")
+                self.status_bar.config(text=f"Saved: {file_path} ({self.file_format.describe()})")
             except Exception as e:
                 messagebox.showerror("Error", f"Could not save file: {str(e)}")
     
+    def iter_line_blocks(self, lines_per_chunk=2000):
+        # (start, stop) indices covering the buffer a block of lines at a time
+        last_line = int(self.text_area.index('end-1c').split('.')[0])
+        for line in range(1, last_line + 1, lines_per_chunk):
+            end = min(line + lines_per_chunk, last_line + 1)
+            yield f"{line}.0", f"{end}.0" if end <= last_line else 'end-1c'
+
+    def iter_buffer_chunks(self, lines_per_chunk=2000):
+        # Hand the buffer to the writer a block of lines at a time
+        for start, stop in self.iter_line_blocks(lines_per_chunk):
+            yield self.text_area.get(start, stop)
+
+    def export_html(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".html",
+            filetypes=[("HTML files", "*.html"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        tag_fonts = {}
+        for tag in session.STYLE_TAGS:
+            font = self.text_area.tag_cget(tag, 'font')
+            if font:
+                tag_fonts[tag] = tkfont.Font(font=font).actual()
+        css = html_export.stylesheet(self.current_theme, languages.HIGHLIGHT_TAGS, tag_fonts)
+        classes = set(languages.HIGHLIGHT_TAGS) | set(tag_fonts)
+        title = os.path.basename(self.current_file) if self.current_file else "Untitled"
+        try:
+            html_export.write_html(file_path, html_export.html_chunks(self.iter_dump_events(), css, title, classes))
+            self.status_bar.config(text=f"Exported: {file_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not export file: {str(e)}")
+
+    def iter_dump_events(self, lines_per_chunk=2000):
+        # Text and tag on/off events in document order, dumped a block of lines at a time
+        for start, stop in self.iter_line_blocks(lines_per_chunk):
+            for key, value, index in self.text_area.dump(start, stop, text=True, tag=True):
+                yield key, value
+
+    def mark_dirty(self, edits):
+        self.buffer_dirty = True
+        self._session_hash = None
+        self._analysis_edited = True
+
+    def check_external_changes(self):
+        try:
+            if self.file_watcher.check():
+                self.reload_from_disk()
+        finally:
+            self.root.after(self.WATCH_INTERVAL, self.check_external_changes)
+
+    def reload_from_disk(self):
+        """Bring the buffer in line with the file on disk, touching only changed lines"""
+        path = self.current_file
+        if self.buffer_dirty:
+            if not messagebox.askyesno(
+                    "File Changed",
+                    f"'{path}' was changed by another program.\n\nReload it and lose your unsaved changes?"):
+                # Keep our version; the next save will overwrite theirs
+                self.file_watcher.sync()
+                return
+        else:
+            # A growing log only needs the new bytes
+            appended = self.file_watcher.read_appended()
+            if appended is not None:
+                at_bottom = self.text_area.yview()[1] >= 1.0
+                self.text_area.insert('end-1c', file_io.decode(appended, self.file_format))
+                if at_bottom:
+                    self.text_area.see(tk.END)
+                self.buffer_dirty = False
+                return
+
+        self.file_watcher.sync()
+        try:
+            self.file_format = file_io.sniff(path)
+            new_lines = file_watcher.split_lines(''.join(file_io.read_chunks(path, self.file_format)))
+        except Exception as e:
+            self.status_bar.config(text=f"Reload failed: {str(e)}")
+            return
+        old_lines = file_watcher.split_lines(self.text_area.get('1.0', 'end-1c'))
+
+        # Apply hunks bottom-up so earlier line numbers stay valid; marks and tags
+        # on untouched lines (cursor, styles) are left alone
+        self.text_area.mark_set('reload_top', '@0,0')
+        with self.undo_manager.group():
+            for i1, i2, j1, j2 in reversed(file_watcher.line_hunks(old_lines, new_lines)):
+                self.text_area.delete(f"{i1 + 1}.0", f"{i2 + 1}.0")
+                self.text_area.insert(f"{i1 + 1}.0", ''.join(new_lines[j1:j2]))
+        self.text_area.yview('reload_top')
+        self.buffer_dirty = False
+        self.status_bar.config(text=f"Reloaded: {path}")
+
+    def content_hash(self):
+        # Identifies the buffer contents a persisted undo history belongs to
+        return hashlib.sha1(self.text_area.get('1.0', 'end-1c').encode('utf-8')).hexdigest()
+
+    def install_edit_proxy(self):
+        """Route the text widget's Tcl command through Python so edits can be observed.
+
+        Each listener is called once per command with the list of
+        ('insert' | 'delete', index, text) edits it made. They run front to
+        back and each index holds once the edits before it are applied, so
+        replaying them in order reproduces the command and every index is
+        also where that edit sits in the text the listeners now see.
+        """
+        self.edit_listeners = []
+        widget = str(self.text_area)
+        self._text_command = widget + '_orig'
+        self.text_area.tk.call('rename', widget, self._text_command)
+        self.text_area.tk.createcommand(widget, self._text_proxy)
+
+    def _notify_edits(self, edits):
+        if edits:
+            for listener in self.edit_listeners:
+                listener(edits)
+
+    def _insert_index(self, index):
+        call = self.text_area.tk.call
+        index = str(call(self._text_command, 'index', index))
+        # Tk inserts text meant for 'end' before the final newline
+        if self.text_area.tk.getboolean(call(self._text_command, 'compare', index, '==', 'end')):
+            index = str(call(self._text_command, 'index', 'end-1c'))
+        return index
+
+    def _delete_ranges(self, args):
+        """Delete the ranges in `args` with one Tk call; returns their edits"""
+        call = self.text_area.tk.call
+        orig = self._text_command
+        spans = []
+        for i in range(0, len(args), 2):
+            start = str(call(orig, 'index', args[i]))
+            end = str(call(orig, 'index', args[i + 1] if i + 1 < len(args) else f"{start}+1c"))
+            # The final newline can never be deleted
+            if self.text_area.tk.getboolean(call(orig, 'compare', end, '>', 'end-1c')):
+                end = str(call(orig, 'index', 'end-1c'))
+            spans.append((tag_batch.parse_index(start), tag_batch.parse_index(end)))
+        spans = tag_batch.merge_spans(spans)
+        edits = []
+        # Report them front to back, each at the index it has once the ranges
+        # before it are gone, as if they had been deleted one at a time
+        line_shift = 0
+        joined_line = None  # Line the previous range ended on...
+        column_shift = 0  # ...and how far its remainder moved left
+        for (start_line, start_column), (end_line, end_column) in spans:
+            line = start_line - line_shift
+            column = start_column - column_shift if start_line == joined_line else start_column
+            text = str(call(orig, 'get', f"{start_line}.{start_column}", f"{end_line}.{end_column}"))
+            edits.append(('delete', f"{line}.{column}", text))
+            line_shift += end_line - start_line
+            joined_line = end_line
+            column_shift = end_column - column
+        if spans:
+            call(orig, 'delete', *[tag_batch.format_index(position) for span in spans for position in span])
+        return edits
+
+    def _text_proxy(self, command, *args):
+        call = self.text_area.tk.call
+        orig = self._text_command
+        if command == 'insert' and len(args) >= 2 and self.edit_listeners:
+            index = self._insert_index(args[0])
+            result = call(orig, command, *args)
+            self._notify_edits([('insert', index, ''.join(args[1::2]))])
+            return result
+        if command == 'delete' and args and self.edit_listeners:
+            self._notify_edits(self._delete_ranges(args))
+            return ''
+        if command == 'replace' and len(args) >= 3 and self.edit_listeners:
+            edits = self._delete_ranges(args[:2])
+            index = self._insert_index(edits[0][1] if edits else args[0])
+            call(orig, 'insert', index, *args[2:])
+            edits.append(('insert', index, ''.join(args[2::2])))
+            self._notify_edits(edits)
+            return ''
+        return call(orig, command, *args)
+
+    def insert_at_each(self, indices, text):
+        """Insert `text` at every index, front to back, notifying the edit
+        listeners once for the lot. Marks are resolved as each insert lands."""
+        call = self.text_area.tk.call
+        orig = self._text_command
+        # Marks created in any order end up ascending; inserting front to back
+        # keeps every reported index valid in the final text
+        indices = sorted(indices, key=lambda index: tag_batch.parse_index(call(orig, 'index', index)))
+        edits = []
+        for index in indices:
+            index = self._insert_index(index)
+            call(orig, 'insert', index, text)
+            edits.append(('insert', index, text))
+        self._notify_edits(edits)
+
+    def is_python_buffer(self):
+        return bool(self.current_file) and self.current_file.lower().endswith(outline.PYTHON_EXTENSIONS)
+
+    def create_outline_panel(self):
+        self.show_outline = tk.BooleanVar(value=False)
+        self.outline_tree = ttk.Treeview(self.text_frame_inner, show='tree', selectmode='browse')
+        self.outline_tree.column('#0', width=220)
+        self.outline_tree.bind('<<TreeviewSelect>>', self.jump_to_outline_selection)
+        self._outline_items = {}
+
+    def toggle_outline(self):
+        if self.show_outline.get():
+            self.outline_tree.grid(row=0, column=3, sticky='ns')
+            self.update_outline_panel()
+        else:
+            self.outline_tree.grid_remove()
+
+    def update_outline_panel(self):
+        if not self.show_outline.get():
+            return
+        tree = self.outline_tree
+        tree.delete(*tree.get_children())
+        self._outline_items = {}
+        parents = {}
+        icons = {'class': 'C', 'function': 'ƒ', 'method': 'm'}
+        for symbol in self.symbol_index.symbols:
+            parent = parents.get(symbol.depth - 1, '') if symbol.depth else ''
+            item = tree.insert(parent, 'end', text=f"{icons[symbol.kind]}  {symbol.name}", open=True)
+            parents[symbol.depth] = item
+            self._outline_items[item] = symbol
+
+    def jump_to_outline_selection(self, event=None):
+        selection = self.outline_tree.selection()
+        if selection and selection[0] in self._outline_items:
+            self.goto_line(self._outline_items[selection[0]].line)
+
+    def goto_line(self, line, column=0):
+        self.text_area.mark_set(tk.INSERT, f"{line}.{column}")
+        self.text_area.see(tk.INSERT)
+        self.text_area.focus_set()
+
+    def goto_symbol(self):
+        if not self.is_python_buffer():
+            self.status_bar.config(text="Go to Symbol needs a Python file")
+            return
+        goto_toplevel = tk.Toplevel(self.root)
+        goto_toplevel.title("Go to Symbol")
+
+        symbol_entry = tk.Entry(goto_toplevel, width=40)
+        symbol_entry.grid(row=0, column=0, padx=4, pady=4, sticky='ew')
+        symbol_entry.focus_set()
+        symbol_list = tk.Listbox(goto_toplevel, width=50, height=12)
+        symbol_list.grid(row=1, column=0, padx=4, pady=4, sticky='nsew')
+        matches = []
+
+        def refresh(event=None):
+            if event is not None and event.keysym in ('Return', 'Escape'):
+                return
+            matches[:] = self.symbol_index.lookup(symbol_entry.get())
+            symbol_list.delete(0, tk.END)
+            for symbol in matches:
+                symbol_list.insert(tk.END, f"{symbol.qualname}  ({symbol.kind}, line {symbol.line})")
+            if matches:
+                symbol_list.selection_set(0)
+
+        def jump(event=None):
+            if matches:
+                selection = symbol_list.curselection()
+                symbol = matches[selection[0] if selection else 0]
+                goto_toplevel.destroy()
+                self.goto_line(symbol.line)
+
+        symbol_entry.bind('<KeyRelease>', refresh)
+        symbol_entry.bind('<Return>', jump)
+        symbol_list.bind('<Double-Button-1>', jump)
+        goto_toplevel.bind('<Escape>', lambda e: goto_toplevel.destroy())
+        refresh()
+
+    def track_outline_edit(self, edits):
+        if not self.is_python_buffer():
+            return
+        for kind, index, text in edits:
+            line = int(index.split('.')[0])
+            newlines = text.count('\n')
+            delta = newlines if kind == 'insert' else -newlines
+            self.symbol_index.shift(line, delta)
+            # Keep the pending dirty range in step with the lines that moved
+            last = line + max(delta, 0)
+            if self._outline_dirty:
+                first, old_last = self._outline_dirty
+                if first > line:
+                    first = max(line, first + delta)
+                if old_last > line:
+                    old_last = max(line, old_last + delta)
+                self._outline_dirty = (min(first, line), max(old_last, last))
+            else:
+                self._outline_dirty = (line, last)
+        self._outline_generation += 1
+        self.schedule_outline_refresh()
+
+    def schedule_outline_refresh(self, delay=400, full=False):
+        self._outline_full = self._outline_full or full
+        if self._outline_job:
+            self.root.after_cancel(self._outline_job)
+        self._outline_job = self.root.after(delay, self.refresh_outline)
+
+    def top_level_block(self, first, last):
+        """Expand lines first..last to the top-level statements containing them"""
+        # Top-level statements start in column 0 (comments and closing brackets don't count)
+        start = self.text_area.search(r'^[^\s#)\]}]', f"{first}.end", stopindex='1.0',
+                                      backwards=True, regexp=True)
+        end = self.text_area.search(r'^[^\s#@)\]}]', f"{last + 1}.0", stopindex=tk.END, regexp=True)
+        start_line = int(start.split('.')[0]) if start else 1
+        if end:
+            end_line = int(end.split('.')[0]) - 1
+        else:
+            end_line = int(self.text_area.index('end-1c').split('.')[0])
+        return start_line, max(start_line, end_line)
+
+    def refresh_outline(self):
+        """Re-parse the dirty top-level blocks (or the whole buffer) on a background thread"""
+        self._outline_job = None
+        if not self.is_python_buffer() or (self._outline_dirty is None and not self._outline_full):
+            return
+        if self._outline_worker and self._outline_worker.is_alive():
+            self.schedule_outline_refresh()
+            return
+
+        last_line = int(self.text_area.index('end-1c').split('.')[0])
+        if self._outline_full:
+            candidates = [(1, last_line)]
+        else:
+            # If a block doesn't parse alone (e.g. an 'else:' or a lone decorator),
+            # retry with one more neighbouring block on each side
+            candidates = []
+            first, last = self._outline_dirty
+            for _ in range(3):
+                first, last = self.top_level_block(first, last)
+                if (first, last) not in candidates:
+                    candidates.append((first, last))
+                first, last = max(1, first - 1), min(last_line, last + 1)
+        snapshots = [(first, last, self.text_area.get(f"{first}.0", f"{last}.end"))
+                     for first, last in candidates]
+
+        result = {}
+
+        def parse():
+            for first, last, source in snapshots:
+                try:
+                    result['value'] = (first, last, outline.parse_symbols(source, first))
+                    return
+                except (SyntaxError, ValueError, RecursionError):
+                    continue
+
+        self._outline_worker = threading.Thread(target=parse, daemon=True)
+        self._outline_worker.start()
+        self.root.after(20, self._finish_outline_parse, result, self._outline_generation)
+
+    def _finish_outline_parse(self, result, generation):
+        if self._outline_worker.is_alive():
+            self.root.after(20, self._finish_outline_parse, result, generation)
+            return
+        if generation != self._outline_generation:
+            # The buffer changed while parsing; the shifted dirty range goes again
+            self.schedule_outline_refresh()
+            return
+        self._outline_dirty = None
+        self._outline_full = False
+        # Blocks that don't parse yet (mid-edit) keep their previous symbols
+        if 'value' in result:
+            first, last, symbols = result['value']
+            self.symbol_index.replace_range(first, last, symbols)
+            self.update_outline_panel()
+
+    def word_run_before(self, index, pattern=completion.LEFT_RUN):
+        """The run `pattern` (anchored at the end) matches up to `index`, however long"""
+        get = self.text_area.get
+        context = self.COMPLETION_CONTEXT
+        run = ''
+        while True:
+            start = f"{index}-{len(run) + context}c"
+            before = get(start, f"{index}-{len(run)}c")
+            left = pattern.search(before).group()
+            run = left + run
+            # Stop at a character outside the run or the start of the buffer
+            if len(left) < len(before) or not before:
+                return run
+
+    def word_run_after(self, index, pattern=completion.RIGHT_RUN):
+        """The run `pattern` matches from `index`, however long"""
+        get = self.text_area.get
+        context = self.COMPLETION_CONTEXT
+        run = ''
+        while True:
+            after = get(f"{index}+{len(run)}c", f"{index}+{len(run) + context}c")
+            right = pattern.match(after).group()
+            run += right
+            if len(right) < len(after) or len(after) < context:
+                return run
+
+    def edit_runs(self, edits, left_pattern=completion.LEFT_RUN, right_pattern=completion.RIGHT_RUN):
+        """(index, old, new) for the runs around a batch of edits: the text from
+        `index` reads `new` now and read `old` before. Edits whose runs touch
+        (several cursors in one word) share one, since each sees the others' text."""
+        get = self.text_area.get
+        # (start, end, old, new): the buffer's start..end now reads `new`, was `old`
+        spans = [(index, undo_manager.advance_index(index, text), '', text) if kind == 'insert'
+                 else (index, index, text, '') for kind, index, text in edits]
+        runs = []
+        i = 0
+        while i < len(spans):
+            start = spans[i][0]
+            left = self.word_run_before(start, left_pattern)
+            j = i
+            while True:
+                end = spans[j][1]
+                right = self.word_run_after(end, right_pattern)
+                run_end = f"{end}+{len(right)}c"
+                if j + 1 < len(spans) and self.text_area.compare(spans[j + 1][0], '<=', run_end):
+                    j += 1
+                else:
+                    break
+            old, new = [left], [left]
+            for k in range(i, j + 1):
+                if k > i:
+                    between = get(spans[k - 1][1], spans[k][0])
+                    old.append(between)
+                    new.append(between)
+                old.append(spans[k][2])
+                new.append(spans[k][3])
+            runs.append((f"{start}-{len(left)}c", ''.join(old) + right, ''.join(new) + right))
+            i = j + 1
+        return runs
+
+    def track_completion_words(self, edits):
+        # Words can only change within the run of word characters around an edit
+        for _, old, new in self.edit_runs(edits):
+            self.word_index.update(old, new)
+
+    def create_completion_popup(self):
+        self.completion_popup = tk.Toplevel(self.root)
+        self.completion_popup.withdraw()
+        self.completion_popup.overrideredirect(True)
+        self.completion_list = tk.Listbox(self.completion_popup, height=8, width=30,
+                                          exportselection=False, font=self.text_font)
+        self.completion_list.pack(fill='both', expand=True)
+        self.completion_list.bind('<Double-Button-1>', lambda e: self.accept_completion())
+        self.completion_prefix = ''
+
+        # Keys go through this tag before the Text bindings so the popup can claim them
+        self.text_area.bindtags(('Completion',) + self.text_area.bindtags())
+        for key in ('<Up>', '<Down>', '<Return>', '<Tab>', '<Escape>'):
+            self.text_area.bind_class('Completion', key, self.handle_completion_key)
+        self.text_area.bind_class('Completion', '<KeyRelease>', self.refresh_completions)
+        self.text_area.bind_class('Completion', '<Button>', lambda e: self.hide_completions())
+
+    def completion_visible(self):
+        return self.completion_popup.winfo_ismapped()
+
+    def current_word_prefix(self):
+        before = self.text_area.get(f"insert-{self.COMPLETION_CONTEXT}c", 'insert')
+        match = completion.LEFT_RUN.search(before).group()
+        # Only a purely alphabetic run counts as a word under the spelling rules
+        return match if match.isalpha() and match.isascii() else ''
+
+    def show_completions(self):
+        self.completion_prefix = self.current_word_prefix()
+        words = self.word_index.complete(self.completion_prefix, self.COMPLETION_COUNT)
+        if not words:
+            self.hide_completions()
+            return
+        self.completion_list.delete(0, tk.END)
+        for word in words:
+            self.completion_list.insert(tk.END, word)
+        self.completion_list.selection_set(0)
+        self.completion_list.config(height=len(words))
+        bbox = self.text_area.bbox('insert')
+        if bbox:
+            x = self.text_area.winfo_rootx() + bbox[0]
+            y = self.text_area.winfo_rooty() + bbox[1] + bbox[3]
+            self.completion_popup.geometry(f"+{x}+{y}")
+        self.completion_popup.deiconify()
+        self.completion_popup.lift()
+
+    def hide_completions(self):
+        self.completion_popup.withdraw()
+
+    def refresh_completions(self, event=None):
+        if not self.completion_visible() or event.keysym in ('Up', 'Down', 'Return', 'Tab', 'Escape'):
+            return
+        if self.current_word_prefix() != self.completion_prefix:
+            self.show_completions()
+
+    def handle_completion_key(self, event):
+        if not self.completion_visible():
+            return None
+        if event.keysym == 'Escape':
+            self.hide_completions()
+        elif event.keysym in ('Up', 'Down'):
+            selection = self.completion_list.curselection()
+            current = selection[0] if selection else 0
+            step = -1 if event.keysym == 'Up' else 1
+            new = max(0, min(self.completion_list.size() - 1, current + step))
+            self.completion_list.selection_clear(0, tk.END)
+            self.completion_list.selection_set(new)
+            self.completion_list.see(new)
+        else:
+            self.accept_completion()
+        return 'break'
+
+    def accept_completion(self):
+        selection = self.completion_list.curselection()
+        if selection:
+            word = self.completion_list.get(selection[0])
+            self.text_area.insert('insert', word[len(self.completion_prefix):])
+        self.hide_completions()
+
+    def find_long_lines(self, text, line=1, length=0):
+        """Scan text (possibly one chunk of a file) for lines over the threshold.
+
+        `line` and `length` describe the unfinished line carried over from the
+        previous chunk; returns (long line numbers, line, length) for the next one.
+        """
+        # Walk newline positions instead of splitting so large files aren't copied
+        threshold = self.LONG_LINE_THRESHOLD
+        long_lines = []
+        start = 0
+        while True:
+            end = text.find('\n', start)
+            segment_end = len(text) if end == -1 else end
+            new_length = length + segment_end - start
+            if length <= threshold < new_length:
+                long_lines.append(line)
+            if end == -1:
+                return long_lines, line, new_length
+            line += 1
+            length = 0
+            start = end + 1
+
+    def set_long_line_mode(self, enabled):
+        if enabled == self.long_line_mode:
+            return
+        self.long_line_mode = enabled
+        if enabled:
+            # Wrapping and extra spacing make Tk re-layout the whole line on every change
+            self.text_area.config(wrap='none', spacing1=0, spacing2=0, spacing3=0)
+            self.h_scrollbar.grid(row=1, column=1, sticky='ew')
+        else:
+            self.text_area.tag_remove('long_line_tail', '1.0', tk.END)
+            self.text_area.config(wrap='word', spacing1=2, spacing2=2, spacing3=2)
+            self.h_scrollbar.grid_remove()
+
+    def collapse_long_lines(self, long_lines=None):
+        """Elide everything past the column limit on long lines so Tk skips laying it out"""
+        self.text_area.tag_remove('long_line_tail', '1.0', tk.END)
+        if not self.long_line_mode or not self.chunk_long_lines.get():
+            return
+        if long_lines is None:
+            long_lines = self.find_long_lines(self.text_area.get('1.0', 'end-1c'))[0]
+        limit = self.LONG_LINE_COLUMN_LIMIT
+        for line in long_lines:
+            self.text_area.tag_add('long_line_tail', f"{line}.{limit}", f"{line}.end")
+        self.reveal_long_line_chunk()
+
+    def reveal_long_line_chunk(self, event=None):
+        # Show only the chunk of the current long line around the cursor
+        if not self.long_line_mode or not self.chunk_long_lines.get():
+            return
+        line, col = map(int, self.text_area.index(tk.INSERT).split('.'))
+        line_length = int(self.text_area.index(f"{line}.end").split('.')[1])
+        if line_length <= self.LONG_LINE_THRESHOLD:
+            return
+        limit = self.LONG_LINE_COLUMN_LIMIT
+        start = max(0, col - limit // 2)
+        end = min(line_length, start + limit)
+        self.text_area.tag_add('long_line_tail', f"{line}.0", f"{line}.end")
+        self.text_area.tag_remove('long_line_tail', f"{line}.{start}", f"{line}.{end}")
+
     def quit_app(self):
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            self.save_session()
             self.root.quit()
+
+    def close_window(self):
+        self.save_session()
+        self.root.destroy()
+
+    def session_snapshot(self):
+        text_area = self.text_area
+        styles = {}
+        for tag in session.STYLE_TAGS:
+            ranges = text_area.tag_ranges(tag)
+            if ranges:
+                # tag_cget gives a named font ("font7") that only exists in this
+                # process, so save what it resolves to
+                font = text_area.tag_cget(tag, 'font')
+                styles[tag] = {'font': tkfont.Font(font=font).actual() if font else None,
+                               'ranges': [str(index) for index in ranges]}
+        snapshot = {
+            'file': self.current_file,
+            # How the file looked on disk when the buffer last matched it
+            'signature': list(self.file_watcher.signature) if self.file_watcher.signature else None,
+            'hash': None,
+            'text': None,
+            'insert': text_area.index('insert'),
+            'top': text_area.index('@0,0'),
+            'theme': 'dark' if self.current_theme is themes.dark_theme else 'default',
+            'styles': styles,
+        }
+        if self.buffer_dirty or not self.current_file:
+            # Unsaved edits travel with the snapshot; saved files are re-read from disk
+            snapshot['text'] = text_area.get('1.0', 'end-1c')
+        else:
+            if self._session_hash is None:
+                self._session_hash = self.content_hash()
+            snapshot['hash'] = self._session_hash
+        return snapshot
+
+    def save_session(self):
+        try:
+            data = session.dumps(self.session_snapshot())
+            if data != self._session_data:
+                session.save(session.session_path(), data)
+                self._session_data = data
+        except (OSError, tk.TclError) as e:
+            self.status_bar.config(text=f"Session snapshot failed: {str(e)}")
+
+    def autosave_session(self):
+        self.save_session()
+        self.root.after(self.SESSION_INTERVAL, self.autosave_session)
+
+    def restore_session(self):
+        snapshot = session.load(session.session_path())
+        if not snapshot:
+            return
+        self.change_theme(snapshot.get('theme', 'default'))
+        path = snapshot.get('file')
+        text = snapshot.get('text')
+        trusted = False
+        if path and os.path.exists(path):
+            self.open_file(path)
+            if self.current_file != path:
+                return
+            if text is None:
+                # An untouched file is taken as is; only a changed one is re-hashed
+                trusted = (session.file_signature(path) == snapshot.get('signature') or
+                           self.content_hash() == snapshot.get('hash'))
+        elif not text:
+            return
+        if text is not None:
+            with self.undo_manager.group():
+                self.text_area.delete('1.0', tk.END)
+                self.text_area.insert('1.0', text)
+            if self.current_file is None:
+                self.undo_manager.clear()
+            self.buffer_dirty = True
+            self.update_line_numbers()
+            trusted = True
+        try:
+            self.text_area.mark_set('insert', snapshot.get('insert', '1.0'))
+            self.text_area.yview(snapshot.get('top', '1.0'))
+        except tk.TclError:
+            pass
+        if trusted:
+            self.restore_styles(snapshot.get('styles', {}))
+            self.status_bar.config(text="Restored last session")
+        else:
+            self.status_bar.config(text="Restored last session (file changed since, formatting dropped)")
+        self.highlight_syntax()
+
+    def restore_styles(self, styles):
+        """Put saved style runs back: the visible ones now, the rest from idle callbacks"""
+        text_area = self.text_area
+        text_area.update_idletasks()
+        top = int(text_area.index('@0,0').split('.')[0])
+        bottom = int(text_area.index(f"@0,{text_area.winfo_height()}").split('.')[0])
+        pending = []
+        for tag, style in styles.items():
+            if tag not in session.STYLE_TAGS:
+                continue
+            font = style.get('font')
+            if isinstance(font, dict):
+                # A font description, so nothing has to keep a named font alive
+                text_area.tag_configure(tag, font=(
+                    font.get('family', self.current_font_family),
+                    font.get('size', self.current_font_size),
+                    font.get('weight', 'normal'),
+                    font.get('slant', 'roman'),
+                    *(['underline'] if font.get('underline') else []),
+                    *(['overstrike'] if font.get('overstrike') else [])))
+            ranges = style['ranges']
+            visible, rest = [], []
+            for start, end in zip(ranges[0::2], ranges[1::2]):
+                if int(start.split('.')[0]) <= bottom and int(end.split('.')[0]) >= top:
+                    visible += (start, end)
+                else:
+                    rest += (start, end)
+            if visible:
+                text_area.tag_add(tag, *visible)
+            step = 2 * self.SESSION_STYLE_BATCH
+            pending += [(tag, rest[i:i + step]) for i in range(0, len(rest), step)]
+        if pending:
+            self._style_job = self.root.after_idle(self.restore_style_batch, pending)
+
+    def restore_style_batch(self, pending):
+        tag, ranges = pending.pop()
+        self.text_area.tag_add(tag, *ranges)
+        self._style_job = self.root.after_idle(self.restore_style_batch, pending) if pending else None
+
+    def cancel_style_restore(self):
+        # Saved runs belong to the restored buffer, not whatever replaces it
+        if self._style_job:
+            self.root.after_cancel(self._style_job)
+            self._style_job = None
     
     def change_font_family(self, event=None, maintain_selection=False):
         if maintain_selection:
@@ -505,16 +1448,21 @@ class TextEditor:
             self.update_format_buttons()
 
             # Handle future typing
-            def handle_keypress(event):
-                if event.char and not event.char.isspace():
-                    current_pos = self.text_area.index("insert")
-                    self.text_area.tag_add(tag_name, f"{current_pos}-1c", current_pos)
-
-            self.text_area.bind("<Key>", handle_keypress, add="+")
+            self._typing_tag = tag_name
 
         except Exception as e:
             print(f"Error in toggle_style: {e}")
 
+    def track_typing_style(self, edits):
+        # Characters typed after toggle_style pick up its tag; pastes and
+        # other multi-character inserts keep their own formatting
+        if not self._typing_tag or self._bulk_inserting:
+            return
+        typed = [index for kind, index, text in edits
+                 if kind == 'insert' and len(text) == 1 and not text.isspace()]
+        if typed:
+            self.text_area.tag_add(self._typing_tag, *[i for index in typed for i in (index, f"{index}+1c")])
+
     def toggle_bold(self):
         self.toggle_style('bold')
 
@@ -607,10 +1555,9 @@ class TextEditor:
             print(f"Error updating font controls: {e}")
 
     def bind_cursor_events(self):
-        # Bind events to update format buttons
-        self.text_area.bind("<KeyRelease>", self.update_format_buttons)
-        self.text_area.bind("<ButtonRelease>", self.update_format_buttons)
-        self.text_area.bind("<<Selection>>", self.update_format_buttons)
+        # Bind events to update format buttons (on_key_release covers typing)
+        self.text_area.bind("<ButtonRelease>", self.update_format_buttons, add='+')
+        self.text_area.bind("<<Selection>>", self.update_format_buttons, add='+')
 
     def find_text(self):
         search_toplevel = tk.Toplevel(self.root)
@@ -623,22 +1570,219 @@ class TextEditor:
 
         def find():
             word = search_entry.get()
-            self.text_area.tag_remove('found', '1.0', tk.END)
+            batch = tag_batch.TagBatch(self.text_area)
+            batch.begin('found')
+            if word:
+                text = self.text_area.get('1.0', 'end-1c')
+                pattern = re.compile(re.escape(word), re.IGNORECASE)
+                batch.add_offsets('found', text, (1, 0), (match.span() for match in pattern.finditer(text)))
+            batch.apply()
             if word:
-                idx = '1.0'
-                while True:
-                    idx = self.text_area.search(word, idx, nocase=1, stopindex=tk.END)
-                    if not idx:
-                        break
-                    lastidx = f'{idx}+{len(word)}c'
-                    self.text_area.tag_add('found', idx, lastidx)
-                    idx = lastidx
                 self.text_area.tag_config('found', foreground='red', background='yellow')
             search_toplevel.destroy()
             self.status_bar.config(text=f"Found occurrences of '{word}'")
 
         tk.Button(search_toplevel, text="Find All", command=find).grid(row=1, column=0, columnspan=2, padx=4, pady=4)
 
+    def find_in_files(self):
+        search_toplevel = tk.Toplevel(self.root)
+        search_toplevel.title("Find in Files")
+        search_toplevel.grid_columnconfigure(1, weight=1)
+        search_toplevel.grid_rowconfigure(4, weight=1)
+
+        tk.Label(search_toplevel, text="Find:").grid(row=0, column=0, padx=4, pady=4, sticky='w')
+        search_entry = tk.Entry(search_toplevel, width=40)
+        search_entry.grid(row=0, column=1, columnspan=2, padx=4, pady=4, sticky='ew')
+        search_entry.focus_set()
+
+        tk.Label(search_toplevel, text="In folder:").grid(row=1, column=0, padx=4, pady=4, sticky='w')
+        folder_entry = tk.Entry(search_toplevel, width=40)
+        folder_entry.insert(0, os.path.dirname(self.current_file) if self.current_file else os.getcwd())
+        folder_entry.grid(row=1, column=1, padx=4, pady=4, sticky='ew')
+
+        def browse():
+            folder = filedialog.askdirectory(initialdir=folder_entry.get())
+            if folder:
+                folder_entry.delete(0, tk.END)
+                folder_entry.insert(0, folder)
+
+        tk.Button(search_toplevel, text="Browse...", command=browse).grid(row=1, column=2, padx=4, pady=4)
+
+        options = tk.Frame(search_toplevel)
+        options.grid(row=2, column=0, columnspan=3, sticky='w')
+        regex_var = tk.BooleanVar(value=False)
+        case_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options, text="Regex", variable=regex_var).pack(side='left', padx=4)
+        tk.Checkbutton(options, text="Match case", variable=case_var).pack(side='left', padx=4)
+
+        results_frame = tk.Frame(search_toplevel)
+        results_frame.grid(row=4, column=0, columnspan=3, padx=4, pady=4, sticky='nsew')
+        results_list = tk.Listbox(results_frame, width=90, height=20, font=self.text_font)
+        results_scroll = ttk.Scrollbar(results_frame, orient='vertical', command=results_list.yview)
+        results_list.config(yscrollcommand=results_scroll.set)
+        results_list.pack(side='left', fill='both', expand=True)
+        results_scroll.pack(side='right', fill='y')
+        search_status = tk.Label(search_toplevel, text="", anchor='w')
+        search_status.grid(row=5, column=0, columnspan=3, padx=4, sticky='ew')
+
+        hits = []  # (path, line, column) for each row of results_list
+        state = {'search': None}
+
+        def cancel():
+            if state['search']:
+                state['search'].cancel()
+                state['search'] = None
+                search_status.config(text=f"Cancelled ({len(hits)} matches so far)")
+
+        def start(event=None):
+            cancel()
+            results_list.delete(0, tk.END)
+            hits.clear()
+            folder = folder_entry.get()
+            if not search_entry.get() or not os.path.isdir(folder):
+                search_status.config(text="Enter a search term and an existing folder")
+                return
+            try:
+                search = find_in_files.FileSearch(folder, search_entry.get(), regex_var.get(), case_var.get())
+            except re.error as e:
+                search_status.config(text=f"Bad pattern: {e}")
+                return
+            state['search'] = search
+            search.start()
+            poll(search)
+
+        def poll(search):
+            # Stream finished batches into the list until the search is done
+            if state['search'] is not search or not search_toplevel.winfo_exists():
+                return
+            # Check before draining so results landing in between aren't lost
+            finished = search.done()
+            for path, file_hits in search.poll():
+                relative = os.path.relpath(path, search.root)
+                for line, column, preview in file_hits:
+                    if len(hits) >= self.FIND_IN_FILES_LIMIT:
+                        break
+                    hits.append((path, line, column))
+                    results_list.insert(tk.END, f"{relative}:{line}: {preview}")
+            if finished:
+                search.close()
+                state['search'] = None
+                search_status.config(text=f"{len(hits)} matches in {search.files_searched} files")
+                return
+            search_status.config(text=f"Searching... {search.files_searched} files, {len(hits)} matches")
+            search_toplevel.after(100, poll, search)
+
+        def open_hit(event=None):
+            selection = results_list.curselection()
+            if not selection:
+                return
+            path, line, column = hits[selection[0]]
+            if path != self.current_file:
+                if self.buffer_dirty and not messagebox.askyesno(
+                        "Unsaved Changes",
+                        f"Open '{path}' and lose your unsaved changes?",
+                        parent=search_toplevel):
+                    return
+                self.open_file(path)
+            if path == self.current_file:
+                self.goto_line(line, column)
+
+        def close():
+            cancel()
+            search_toplevel.destroy()
+
+        buttons = tk.Frame(search_toplevel)
+        buttons.grid(row=3, column=0, columnspan=3, sticky='w')
+        tk.Button(buttons, text="Search", command=start).pack(side='left', padx=4, pady=4)
+        tk.Button(buttons, text="Cancel", command=cancel).pack(side='left', padx=4, pady=4)
+        search_entry.bind('<Return>', start)
+        results_list.bind('<Double-Button-1>', open_hit)
+        results_list.bind('<Return>', open_hit)
+        search_toplevel.protocol("WM_DELETE_WINDOW", close)
+
+    def compare_with_saved(self):
+        if not self.current_file or not os.path.exists(self.current_file):
+            messagebox.showinfo("Compare with Saved", "The buffer hasn't been saved to a file yet.")
+            return
+        self.show_diff(self.current_file, os.path.basename(self.current_file), "Buffer")
+
+    def compare_with_backup(self):
+        if not os.path.exists(self.BACKUP_PATH):
+            messagebox.showinfo("Compare with Backup", "No autosave backup has been written yet.")
+            return
+        self.show_diff(self.BACKUP_PATH, "Backup", "Buffer")
+
+    def show_diff(self, path, old_name, new_name):
+        """Show the changes between the file at `path` and the buffer as inline hunks"""
+        try:
+            old_text = ''.join(file_io.read_chunks(path, file_io.sniff(path)))
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not read file: {str(e)}")
+            return
+        old_lines = old_text.split('\n')
+        new_lines = self.text_area.get('1.0', 'end-1c').split('\n')
+        del old_text
+        hunks = diffing.group_hunks(diffing.opcodes(old_lines, new_lines), self.DIFF_CONTEXT)
+
+        diff_toplevel = tk.Toplevel(self.root)
+        diff_toplevel.title(f"{old_name} \u2192 {new_name}")
+        diff_toplevel.grid_columnconfigure(0, weight=1)
+        diff_toplevel.grid_rowconfigure(1, weight=1)
+        theme = self.current_theme
+        diff_view = tk.Text(diff_toplevel, wrap='none', width=100, height=30, font=self.text_font,
+                            bg=theme['bg'], fg=theme['fg'], insertbackground=theme['cursor'])
+        diff_scroll = ttk.Scrollbar(diff_toplevel, orient='vertical', command=diff_view.yview)
+        diff_view.config(yscrollcommand=diff_scroll.set)
+        diff_view.grid(row=1, column=0, sticky='nsew')
+        diff_scroll.grid(row=1, column=1, sticky='ns')
+        diff_view.tag_configure('diff_header', foreground=theme['diff_header_fg'])
+        diff_view.tag_configure('diff_delete', background=theme['diff_delete_bg'])
+        diff_view.tag_configure('diff_insert', background=theme['diff_insert_bg'])
+
+        # Each hunk goes in with a single insert of alternating text/tag arguments
+        for number, hunk in enumerate(hunks):
+            i1, j1 = hunk[0][1], hunk[0][3]
+            i2, j2 = hunk[-1][2], hunk[-1][4]
+            diff_view.mark_set(f"hunk{number}", 'end-1c')
+            diff_view.mark_gravity(f"hunk{number}", 'left')
+            chunks = [f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@\n", 'diff_header']
+            for tag, a1, a2, b1, b2 in hunk:
+                if tag == 'equal':
+                    chunks += [''.join(f"  {line}\n" for line in old_lines[a1:a2]), ()]
+                    continue
+                if a1 < a2:
+                    chunks += [''.join(f"- {line}\n" for line in old_lines[a1:a2]), 'diff_delete']
+                if b1 < b2:
+                    chunks += [''.join(f"+ {line}\n" for line in new_lines[b1:b2]), 'diff_insert']
+            diff_view.insert('end', *chunks)
+        if not hunks:
+            diff_view.insert('end', "No differences")
+        diff_view.config(state='disabled')
+
+        position = {'hunk': -1}
+        summary = tk.Label(diff_toplevel, anchor='w')
+
+        def jump(step):
+            if not hunks:
+                return 'break'
+            position['hunk'] = (position['hunk'] + step) % len(hunks)
+            diff_view.yview(f"hunk{position['hunk']}")
+            diff_view.mark_set('insert', f"hunk{position['hunk']}")
+            summary.config(text=f"Hunk {position['hunk'] + 1} of {len(hunks)}")
+            return 'break'
+
+        controls = tk.Frame(diff_toplevel)
+        controls.grid(row=0, column=0, columnspan=2, sticky='ew')
+        tk.Button(controls, text="Previous", command=lambda: jump(-1)).pack(side='left', padx=4, pady=4)
+        tk.Button(controls, text="Next", command=lambda: jump(1)).pack(side='left', padx=4, pady=4)
+        summary.config(text=f"{len(hunks)} hunks")
+        summary.grid(row=2, column=0, columnspan=2, sticky='ew', padx=4)
+        diff_view.bind('n', lambda e: jump(1))
+        diff_view.bind('p', lambda e: jump(-1))
+        diff_view.focus_set()
+        if hunks:
+            jump(1)
+
     def replace_text(self):
         replace_toplevel = tk.Toplevel(self.root)
         replace_toplevel.title("Replace")
@@ -656,26 +1800,35 @@ class TextEditor:
 
             word = search_entry.get()
             replace_text = replace_entry.get()
-            content = self.text_area.get('1.0', tk.END)
-            new_content = content.replace(word, replace_text)
-            self.text_area.delete('1.0', tk.END)
-            self.text_area.insert('1.0', new_content)
+            # Replace each occurrence in place so undo only stores the changed spans.
+            # Matches are found over the whole buffer (Text.search skips elided
+            # long-line tails and folded blocks) and replaced bottom-up so the
+            # positions of earlier ones stay valid
+            if word:
+                text = self.text_area.get('1.0', 'end-1c')
+                offsets = [offset for match in re.finditer(re.escape(word), text)
+                           for offset in match.span()]
+                positions = list(tag_batch.offset_positions(text, (1, 0), offsets))
+                with self.undo_manager.group():
+                    for i in range(len(positions) - 2, -1, -2):
+                        self.text_area.replace(tag_batch.format_index(positions[i]),
+                                               tag_batch.format_index(positions[i + 1]), replace_text)
             self.status_bar.config(text=f"Replaced '{word}' with '{replace_text}'")
             replace_toplevel.destroy()
 
         tk.Button(replace_toplevel, text="Replace All", command=replace).grid(row=2, column=0, columnspan=2, padx=4, pady=4)
 
     def undo_edit(self):
-        try:
-            self.text_area.edit_undo()
-        except tk.TclError:
-            pass
+        position = self.undo_manager.undo()
+        if position:
+            self.text_area.mark_set(tk.INSERT, position)
+            self.text_area.see(tk.INSERT)
     
     def redo_edit(self):
-        try:
-            self.text_area.edit_redo()
-        except tk.TclError:
-            pass
+        position = self.undo_manager.redo()
+        if position:
+            self.text_area.mark_set(tk.INSERT, position)
+            self.text_area.see(tk.INSERT)
 
     def apply_theme(self, theme):
         # Update ttk styles for the current theme
@@ -723,6 +1876,10 @@ class TextEditor:
             background=theme['menu_bg'],
             foreground=theme['menu_fg']
         )
+        self.stats_label.config(
+            background=theme['menu_bg'],
+            foreground=theme['menu_fg']
+        )
         
         # Apply theme to toolbar buttons and menus
         for widget in self.main_frame.winfo_children():
@@ -738,10 +1895,13 @@ class TextEditor:
                 widget.configure(style='TSeparator')
         
         # Update syntax highlighting colors
-        self.text_area.tag_config('keyword', foreground=theme['keyword'])
+        for tag in languages.HIGHLIGHT_TAGS:
+            self.text_area.tag_config(tag, foreground=theme[tag])
         self.text_area.tag_config('bracket', foreground=theme['bracket'])
         self.text_area.tag_config('misspelled', foreground=theme['misspelled'])
         self.text_area.tag_config('found', foreground=theme['found_fg'], background=theme['found_bg'])
+        self.text_area.tag_config('multi_sel', foreground=theme['select_fg'], background=theme['select_bg'])
+        self.text_area.tag_config('multi_cursor', foreground=theme['bg'], background=theme['cursor'])
 
     def change_theme(self, theme_name):
         if theme_name == 'default':
@@ -751,9 +1911,331 @@ class TextEditor:
         self.apply_theme(self.current_theme)
 
     def on_key_release(self, event=None):
+        self.update_format_buttons()
+        self.update_font_controls()
+        self.update_stats_display()
+        if self._bulk_job is not None:
+            # A paste is waiting for its own analysis pass
+            return
+        # Keys that didn't edit (arrows, modifiers) leave the highlighting valid
+        if self._analysis_edited or self.long_line_mode:
+            self._analysis_edited = False
+            self.highlight_syntax()
+        if int(self.text_area.index('end-1c').split('.')[0]) != self._numbered_lines:
+            self.update_line_numbers()
+        self.check_spelling()
+
+    def create_multi_cursor_bindings(self):
+        # Keys go through this tag first so every cursor gets them while several are active
+        self.text_area.bindtags(('MultiCursor',) + self.text_area.bindtags())
+        self.text_area.bind_class('MultiCursor', '<Key>', self.handle_multi_cursor_key)
+        self.text_area.bind_class('MultiCursor', '<Button-1>', lambda e: self.clear_cursors())
+        modifier = 'Command' if sys.platform == 'darwin' else 'Control'
+        self.text_area.bind(f'<{modifier}-d>', lambda e: self.add_cursor_at_next_occurrence() or 'break')
+        self.text_area.bind('<Alt-Shift-Up>', lambda e: self.add_cursor_vertically(-1) or 'break')
+        self.text_area.bind('<Alt-Shift-Down>', lambda e: self.add_cursor_vertically(1) or 'break')
+        # Alt-drag makes a column (box) selection with one cursor per line
+        self.text_area.bind('<Alt-Button-1>', self.start_column_selection)
+        self.text_area.bind('<Alt-B1-Motion>', self.extend_column_selection)
+
+    def add_cursor(self, start, end=None):
+        self._cursor_serial += 1
+        start_mark, end_mark = f"cursor{self._cursor_serial}", f"cursor{self._cursor_serial}_end"
+        self.text_area.mark_set(start_mark, start)
+        self.text_area.mark_set(end_mark, end or start)
+        # Text typed at a cursor goes between its marks' neighbours, never inside them
+        self.text_area.mark_gravity(start_mark, 'left')
+        self.text_area.mark_gravity(end_mark, 'right')
+        self.cursors.append((start_mark, end_mark))
+
+    def clear_cursors(self):
+        for start_mark, end_mark in self.cursors:
+            self.text_area.mark_unset(start_mark, end_mark)
+        self.cursors = []
+        self.text_area.tag_remove('multi_sel', '1.0', tk.END)
+        self.text_area.tag_remove('multi_cursor', '1.0', tk.END)
+
+    def cursor_spans(self):
+        """(start, end) (line, column) positions of each cursor, in cursor order"""
+        index = self.text_area.index
+        return [(tag_batch.parse_index(index(start_mark)), tag_batch.parse_index(index(end_mark)))
+                for start_mark, end_mark in self.cursors]
+
+    def begin_multi_cursor(self):
+        # The primary cursor (and selection) joins the list the first time it's needed
+        if self.cursors:
+            return
+        if self.text_area.tag_ranges('sel'):
+            self.add_cursor(self.text_area.index('sel.first'), self.text_area.index('sel.last'))
+            self.text_area.tag_remove('sel', '1.0', tk.END)
+        else:
+            self.add_cursor(self.text_area.index('insert'))
+
+    def add_cursor_at_next_occurrence(self):
+        if not self.cursors and not self.text_area.tag_ranges('sel'):
+            # First press just selects the word under the cursor
+            start = self.text_area.index('insert wordstart')
+            end = self.text_area.index('insert wordend')
+            if self.text_area.get(start, end).strip():
+                self.text_area.tag_add('sel', start, end)
+            return
+        self.begin_multi_cursor()
+        start, end = self.cursors[-1]
+        word = self.text_area.get(start, end)
+        if not word:
+            return
+        taken = set(self.cursor_spans())
+        index = end
+        # The search wraps around the buffer; every taken occurrence is passed at most once
+        for _ in range(len(taken) + 1):
+            found = self.text_area.search(word, index, exact=True)
+            if not found:
+                return
+            found_end = self.text_area.index(f"{found}+{len(word)}c")
+            if (tag_batch.parse_index(found), tag_batch.parse_index(found_end)) not in taken:
+                self.add_cursor(found, found_end)
+                self.text_area.see(found)
+                self.render_cursors()
+                return
+            index = found_end
+
+    def add_cursor_vertically(self, step):
+        self.begin_multi_cursor()
+        line, column = self.cursor_spans()[-1][1]
+        line += step
+        if line < 1 or line > int(self.text_area.index('end-1c').split('.')[0]):
+            return
+        self.add_cursor(self.text_area.index(f"{line}.{column}"))
+        self.text_area.see(f"{line}.0")
+        self.render_cursors()
+
+    def start_column_selection(self, event):
+        self.clear_cursors()
+        self._column_anchor = tag_batch.parse_index(self.text_area.index(f"@{event.x},{event.y}"))
+        self.text_area.tag_remove('sel', '1.0', tk.END)
+        return 'break'
+
+    def extend_column_selection(self, event):
+        if self._column_anchor is None:
+            return 'break'
+        anchor_line, anchor_column = self._column_anchor
+        line, column = tag_batch.parse_index(self.text_area.index(f"@{event.x},{event.y}"))
+        first_column, last_column = sorted((anchor_column, column))
+        for start_mark, end_mark in self.cursors:
+            self.text_area.mark_unset(start_mark, end_mark)
+        self.cursors = []
+        for row in range(min(anchor_line, line), max(anchor_line, line) + 1):
+            # Tk clamps columns past the end of a short line to its end
+            self.add_cursor(self.text_area.index(f"{row}.{first_column}"),
+                            self.text_area.index(f"{row}.{last_column}"))
+        self.render_cursors()
+        return 'break'
+
+    def render_cursors(self, spans=None):
+        batch = tag_batch.TagBatch(self.text_area)
+        batch.begin('multi_sel')
+        batch.begin('multi_cursor')
+        if spans is None:
+            spans = self.cursor_spans()
+        for start, end in spans:
+            if start != end:
+                batch.add('multi_sel', start, end)
+            # At the end of a line the cursor block covers the newline instead
+            line_end = tag_batch.parse_index(self.text_area.index(f"{end[0]}.end"))
+            batch.add('multi_cursor', end, (end[0] + 1, 0) if end == line_end else (end[0], end[1] + 1))
+        batch.apply()
+        if spans:
+            self.text_area.mark_set('insert', tag_batch.format_index(spans[-1][1]))
+
+    def drop_duplicate_cursors(self):
+        """Merge cursors that edits have pushed onto the same spot; returns their spans"""
+        seen = set()
+        cursors = []
+        spans = []
+        for marks, span in zip(self.cursors, self.cursor_spans()):
+            if span in seen:
+                self.text_area.mark_unset(*marks)
+            else:
+                seen.add(span)
+                cursors.append(marks)
+                spans.append(span)
+        self.cursors = cursors
+        return spans
+
+    def handle_multi_cursor_key(self, event):
+        # Shortcuts (Control, Alt/Command) keep their usual meaning
+        if not self.cursors or event.state & self.SHORTCUT_STATE:
+            return None
+        keysym = event.keysym
+        if keysym == 'Escape':
+            self.clear_cursors()
+        elif keysym == 'BackSpace':
+            self.multi_cursor_delete(-1)
+        elif keysym == 'Delete':
+            self.multi_cursor_delete(1)
+        elif keysym in ('Return', 'KP_Enter'):
+            self.multi_cursor_insert('\n')
+        elif keysym == 'Tab':
+            self.multi_cursor_insert('\t')
+        elif keysym in self.CURSOR_MOVES:
+            self.multi_cursor_move(self.CURSOR_MOVES[keysym])
+        elif event.char and event.char.isprintable():
+            self.multi_cursor_insert(event.char)
+        else:
+            return None
+        return 'break'
+
+    def multi_cursor_insert(self, text):
+        """Type `text` at every cursor as one undo step and one highlight pass"""
+        spans = self.cursor_spans()
+        first = min(start[0] for start, end in spans)
+        with self.undo_manager.group():
+            self.delete_cursor_ranges([(start, end) for start, end in spans if start != end])
+            self.insert_at_each([end_mark for start_mark, end_mark in self.cursors], text)
+            for start_mark, end_mark in self.cursors:
+                self.text_area.mark_set(start_mark, end_mark)
+        self.finish_multi_cursor_edit(first)
+
+    def multi_cursor_delete(self, direction):
+        spans = self.cursor_spans()
+        first = min(start[0] for start, end in spans) - (direction < 0)
+        ranges = []
+        for (start, end), (start_mark, end_mark) in zip(spans, self.cursors):
+            if start != end:
+                ranges.append((start, end))
+            elif direction < 0:
+                ranges.append((tag_batch.parse_index(self.text_area.index(f"{end_mark}-1c")), end))
+            else:
+                ranges.append((end, tag_batch.parse_index(self.text_area.index(f"{end_mark}+1c"))))
+        with self.undo_manager.group():
+            self.delete_cursor_ranges(ranges)
+        self.finish_multi_cursor_edit(max(1, first))
+
+    def delete_cursor_ranges(self, ranges):
+        # One multi-range delete; neighbouring cursors' ranges may overlap
+        ranges = tag_batch.merge_spans(ranges)
+        if ranges:
+            self.text_area.delete(*[tag_batch.format_index(position) for span in ranges for position in span])
+
+    def multi_cursor_move(self, offset):
+        for start_mark, end_mark in self.cursors:
+            self.text_area.mark_set(end_mark, f"{end_mark} {offset}")
+            self.text_area.mark_set(start_mark, end_mark)
+        self.render_cursors(self.drop_duplicate_cursors())
+        self.text_area.see('insert')
+
+    def finish_multi_cursor_edit(self, first):
+        spans = self.drop_duplicate_cursors()
+        last = max(end[0] for start, end in spans)
+        # The edit is highlighted here, so the key release has nothing left to redo
+        self.highlight_edited_lines(first, last)
+        self._analysis_edited = False
+        self.render_cursors(spans)
+        self.text_area.see('insert')
+
+    def track_stats_edit(self, edits):
+        for kind, index, text in edits:
+            self.doc_stats.chars += len(text) if kind == 'insert' else -len(text)
+        if not any('\n' in text for _, _, text in edits):
+            # Within a line only the runs of non-space characters around the
+            # edits can gain or lose words, however long the line is
+            # (a run of non-space characters never leaves its line)
+            for index, old, new in self.edit_runs(edits, doc_stats.LEFT_RUN, doc_stats.RIGHT_RUN):
+                delta = doc_stats.count_words(new) - doc_stats.count_words(old)
+                if delta:
+                    self.doc_stats.add_words(int(index.split('.')[0]), delta)
+            return
+        # Edits that add or remove lines recount the lines they touched
+        for kind, index, text in edits:
+            line = int(index.split('.')[0])
+            newlines = text.count('\n')
+            if kind == 'insert':
+                last, new_last = line, line + newlines
+            else:
+                last, new_last = line + newlines, line
+            new_lines = self.text_area.get(f"{line}.0", f"{new_last}.end").split('\n')
+            self.doc_stats.replace_lines(line, last, new_lines)
+
+    def selection_words(self, start, end):
+        first, last = int(start.split('.')[0]), int(end.split('.')[0])
+        if first == last:
+            return doc_stats.count_words(self.text_area.get(start, end))
+        # Partial first and last lines are counted directly, whole lines from the cache
+        return (doc_stats.count_words(self.text_area.get(start, f"{first}.end")) +
+                self.doc_stats.words_in_lines(first + 1, last - 1) +
+                doc_stats.count_words(self.text_area.get(f"{last}.0", end)))
+
+    def update_stats_display(self, event=None):
+        line, column = self.text_area.index('insert').split('.')
+        parts = [f"Ln {line}, Col {int(column) + 1}"]
+        if self.text_area.tag_ranges('sel'):
+            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
+            chars = int(self.text_area.tk.call(self.text_area._w, 'count', '-chars', start, end))
+            parts.append(f"{chars:,} selected ({self.selection_words(start, end):,} words)")
+        parts.append(f"{self.doc_stats.words:,} words, {self.doc_stats.chars:,} chars")
+        self.stats_label.config(text="  |  ".join(parts))
+
+    def paste(self, event=None):
+        try:
+            text = self.text_area.clipboard_get()
+        except tk.TclError:
+            return 'break'
+        with self.undo_manager.group():
+            if self.text_area.tag_ranges('sel'):
+                self.text_area.delete('sel.first', 'sel.last')
+            self.bulk_insert(text)
+        self.text_area.see('insert')
+        return 'break'
+
+    def bulk_insert(self, text, index='insert'):
+        """Insert a large payload in chunks as one undo step, then analyse it once.
+
+        Highlighting, line numbers and spell checking are held back while the
+        chunks go in; a single pass over just the inserted lines follows.
+        """
+        text_area = self.text_area
+        start = text_area.index(index)
+        line, column = map(int, start.split('.'))
+        # Right gravity keeps the mark after each chunk, so it ends up at the end of the insert
+        text_area.mark_set('bulk_insert', start)
+        text_area.mark_gravity('bulk_insert', 'right')
+        long_lines = []
+        self._bulk_inserting = True
+        try:
+            with self.undo_manager.group():
+                for offset in range(0, len(text), self.PASTE_CHUNK_SIZE):
+                    chunk = text[offset:offset + self.PASTE_CHUNK_SIZE]
+                    found, line, column = self.find_long_lines(chunk, line, column)
+                    if found:
+                        # Switch layout mode before inserting so Tk never wraps a huge line
+                        long_lines.extend(found)
+                        self.set_long_line_mode(True)
+                    text_area.insert('bulk_insert', chunk)
+        finally:
+            self._bulk_inserting = False
+        end = text_area.index('bulk_insert')
+        text_area.mark_unset('bulk_insert')
+        if long_lines:
+            self.collapse_long_lines()
+        self.schedule_bulk_analysis(int(start.split('.')[0]), int(end.split('.')[0]))
+
+    def schedule_bulk_analysis(self, first, last):
+        if self._bulk_range:
+            first = min(first, self._bulk_range[0])
+            last = max(last, self._bulk_range[1])
+        self._bulk_range = (first, last)
+        if self._bulk_job is None:
+            self._bulk_job = self.root.after_idle(self.run_bulk_analysis)
+
+    def run_bulk_analysis(self):
+        first, last = self._bulk_range
+        self._bulk_job = None
+        self._bulk_range = None
+        self._analysis_edited = False
         self.update_line_numbers()
-        self.highlight_syntax()
+        self.highlight_edited_lines(first, last)
         self.check_spelling()
+        self.update_stats_display()
     
     def match_brackets(self, event=None):
         # Remove existing bracket tags
@@ -814,44 +2296,195 @@ class TextEditor:
     def update_line_numbers(self):
         self.line_numbers.config(state='normal')
         self.line_numbers.delete(1.0, tk.END)
-        line_count = self.text_area.index('end-1c').split('.')[0]
-        line_numbers = "\n".join(str(i) for i in range(1, int(line_count)))
-        self.line_numbers.insert(1.0, line_numbers)
+        line_count = int(self.text_area.index('end-1c').split('.')[0])
+        self._numbered_lines = line_count
+        # Folded lines get no number; their header is marked instead
+        folds = self.folded_ranges()
+        numbers = []
+        line = 1
+        for header, last in folds:
+            numbers.extend(str(i) for i in range(line, header))
+            numbers.append(f"{header} ▸")
+            line = last + 1
+        numbers.extend(str(i) for i in range(line, line_count + 1))
+        self.line_numbers.insert(1.0, "\n".join(numbers))
         self.line_numbers.config(state='disabled')
 
+    def folded_ranges(self):
+        """(header line, last hidden line) for every folded block"""
+        ranges = self.text_area.tag_ranges('folded')
+        return [(int(str(ranges[i]).split('.')[0]), int(str(ranges[i + 1]).split('.')[0]))
+                for i in range(0, len(ranges), 2)]
+
+    def visible_segments(self, start, end):
+        # Split start..end around folded text, which spellcheck must skip
+        index = self.text_area.index(start)
+        end = self.text_area.index(end)
+        while self.text_area.compare(index, '<', end):
+            fold = self.text_area.tag_nextrange('folded', index, end)
+            if not fold:
+                yield index, end
+                return
+            if self.text_area.compare(index, '<', fold[0]):
+                yield index, fold[0]
+            index = str(fold[1])
+
+    def fold_block_end(self, line):
+        """Last line of the block opened by `line`, using auto_indent's trailing ':' rule"""
+        header = self.text_area.get(f"{line}.0", f"{line}.end")
+        if not header.rstrip().endswith(':'):
+            return None
+        indent = len(header) - len(header.lstrip(' \t'))
+        # The block runs until the next non-blank line indented no deeper than the header
+        stop = self.text_area.search(rf'^[ \t]{{0,{min(indent, 255)}}}\S', f"{line + 1}.0",
+                                     stopindex=tk.END, regexp=True)
+        last = int(stop.split('.')[0]) - 1 if stop else int(self.text_area.index('end-1c').split('.')[0])
+        # Trailing blank lines stay visible
+        content = self.text_area.search(r'\S', f"{last}.end", stopindex=f"{line}.end",
+                                        backwards=True, regexp=True)
+        last = int(content.split('.')[0]) if content else line
+        return last if last > line else None
+
+    def fold_block(self, line=None):
+        if line is None:
+            line = int(self.text_area.index(tk.INSERT).split('.')[0])
+        last = self.fold_block_end(line)
+        if last:
+            # Keep the header visible and hide from its newline to the block's end
+            self.text_area.tag_add('folded', f"{line}.end", f"{last}.end")
+            self.update_line_numbers()
+
+    def unfold_block(self, line=None):
+        if line is None:
+            line = int(self.text_area.index(tk.INSERT).split('.')[0])
+        fold = self.text_area.tag_nextrange('folded', f"{line}.end")
+        if fold and self.text_area.compare(fold[0], '==', f"{line}.end"):
+            self.text_area.tag_remove('folded', fold[0], fold[1])
+            self.update_line_numbers()
+            self.refresh_unfolded([(line, int(str(fold[1]).split('.')[0]))])
+
+    def toggle_fold_from_gutter(self, event):
+        gutter_line = self.line_numbers.index(f"@{event.x},{event.y}").split('.')[0]
+        label = self.line_numbers.get(f"{gutter_line}.0", f"{gutter_line}.end").split()
+        if not label:
+            return 'break'
+        line = int(label[0])
+        if len(label) > 1:
+            self.unfold_block(line)
+        else:
+            self.fold_block(line)
+        return 'break'
+
+    def fold_all(self):
+        # Fold every top-level block; search skips what's already folded
+        idx = '1.0'
+        while True:
+            idx = self.text_area.search(r'^\S.*:\s*$', idx, stopindex=tk.END, regexp=True)
+            if not idx:
+                break
+            line = int(idx.split('.')[0])
+            last = self.fold_block_end(line)
+            if last:
+                self.text_area.tag_add('folded', f"{line}.end", f"{last}.end")
+                line = last
+            idx = f"{line + 1}.0"
+        self.update_line_numbers()
+
+    def unfold_all(self):
+        folds = self.folded_ranges()
+        self.text_area.tag_remove('folded', '1.0', tk.END)
+        self.update_line_numbers()
+        self.refresh_unfolded(folds)
+
+    def refresh_unfolded(self, folds):
+        # Highlighting skips folded lines and edits only re-highlight around the
+        # cursor, so lines coming back into view need their tokens and spelling
+        for first, last in folds:
+            self.highlight_region(first, last)
+        self.check_spelling()
+
     def highlight_syntax(self):
-        # Clear existing tags
-        self.text_area.tag_remove('keyword', '1.0', tk.END)
-        self.text_area.tag_remove('misspelled', '1.0', tk.END)
+        # Clear existing tags ('misspelled' is left to check_spelling's batch)
         self.text_area.tag_remove('bracket', '1.0', tk.END)
-        # Define keywords
-        keywords = ['def', 'class', 'import', 'from', 'return', 'if', 'else', 'elif',
-                    'for', 'while', 'try', 'except', 'with', 'as', 'pass', 'break', 'continue']
-        # Apply highlighting
-        for keyword in keywords:
-            idx = '1.0'
-            while True:
-                idx = self.text_area.search(r'\b' + keyword + r'\b', idx, nocase=0,
-                                            stopindex=tk.END, regexp=True)
-                if not idx:
-                    break
-                lastidx = f'{idx}+{len(keyword)}c'
-                self.text_area.tag_add('keyword', idx, lastidx)
-                idx = lastidx
+        self.highlight_region()
         # Configure tag styles
-        self.text_area.tag_config('keyword', foreground='blue')
         self.text_area.tag_config('bracket', foreground='red')
         self.text_area.tag_config('misspelled', foreground='red', underline=1)
         # ...add more syntax rules as needed...
 
+    def highlight_edited_lines(self, first_line, last_line):
+        """Re-highlight the lines an edit touched, plus any token crossing their edges.
+
+        Falls back to the whole buffer when the edit opened a multi-line token
+        (a string or comment that now runs past the lines looked at).
+        """
+        start, end = f"{first_line}.0", f"{last_line + 1}.0"
+        for tag in languages.HIGHLIGHT_TAGS:
+            before = self.text_area.tag_prevrange(tag, start)
+            if before and self.text_area.compare(before[1], '>', start):
+                first_line = min(first_line, int(str(before[0]).split('.')[0]))
+            around = self.text_area.tag_prevrange(tag, end)
+            if around and self.text_area.compare(around[1], '>', end):
+                last_line = max(last_line, int(str(around[1]).split('.')[0]))
+        if self.highlight_region(first_line, last_line):
+            self.highlight_region()
+
+    def highlight_region(self, first_line=None, last_line=None):
+        """Re-tokenise lines first_line..last_line, or the whole buffer by default.
+
+        Returns True if a multi-line token ran into the end of the lines given,
+        so the text after them may need highlighting again too.
+        """
+        if first_line is None or self.long_line_mode:
+            region = ()
+            start, end = '1.0', 'end-1c'
+        else:
+            region = ((first_line, 0), (last_line + 1, 0))
+            start, end = f"{first_line}.0", f"{last_line + 1}.0"
+        # Token spans are collected here and only the difference is sent to Tk
+        batch = tag_batch.TagBatch(self.text_area, *region)
+        for tag in languages.HIGHLIGHT_TAGS:
+            batch.begin(tag)
+        # Plain text collects nothing, which clears whatever a previous grammar left
+        spilled = False
+        if self.grammar is not None and self.long_line_mode:
+            self.highlight_long_lines(batch)
+        elif self.grammar is not None:
+            # Apply highlighting (folded blocks are skipped, so they cost nothing)
+            for segment_start, segment_end in self.visible_segments(start, end):
+                text = self.text_area.get(segment_start, segment_end)
+                tokens = list(self.grammar.tokens(text))
+                batch.add_tokens(text, tag_batch.parse_index(segment_start), tokens)
+                # Unterminated strings and comments run to the end of the text given
+                if region and tokens and tokens[-1][2] == len(text) and '\n' in text[tokens[-1][1]:]:
+                    spilled = self.text_area.compare(segment_end, '==', end)
+        batch.apply()
+        return spilled and self.text_area.compare(end, '<', 'end-1c')
+
+    def highlight_long_lines(self, batch):
+        # Only the visible lines, clipped to the column limit, are scanned in long-line mode
+        limit = self.LONG_LINE_COLUMN_LIMIT
+        first_line = int(self.text_area.index("@0,0").split('.')[0])
+        last_line = int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split('.')[0])
+        for line in range(first_line, last_line + 1):
+            text = self.text_area.get(f"{line}.0", f"{line}.{limit}")
+            for tag, start, end in self.grammar.tokens(text):
+                batch.add(tag, (line, start), (line, end))
+
     def check_spelling(self):
         """Spell check the visible text while preserving styling"""
         if not self.SPELL_CHECK_ENABLED:
             return
             
         try:
-            self.text_area.tag_remove('misspelled', '1.0', tk.END)
-            
+            batch = tag_batch.TagBatch(self.text_area)
+            batch.begin('misspelled')
+
+            # Visible lines can be megabytes long in long-line mode
+            if self.long_line_mode:
+                batch.apply()
+                return
+
             # Get visible text region
             first_visible = self.text_area.index("@0,0")
             last_visible = self.text_area.index(f"@0,{self.text_area.winfo_height()}")
@@ -859,40 +2492,10 @@ class TextEditor:
             # Cache for checked words
             checked_words = {}
             
-            # Find words in visible text
-            import re
-            text = self.text_area.get(first_visible, last_visible)
-            
-            for match in re.finditer(r'\b[a-zA-Z]+\b', text):
-                word = match.group()
-                
-                # Skip checking if word is too short or likely a code identifier
-                if len(word) <= 1 or (word.lower() != word and word.upper() != word):
-                    continue
-                    
-                # Use cached result if available
-                if word.lower() in checked_words:
-                    is_correct = checked_words[word.lower()]
-                else:
-                    is_correct = self.spell_checker.check(word)
-                    checked_words[word.lower()] = is_correct
-                
-                if not is_correct:
-                    start = match.start()
-                    end = match.end()
-                    start_idx = f"{first_visible}+{start}c"
-                    end_idx = f"{first_visible}+{end}c"
-                    
-                    # Add misspelled tag while preserving existing styles
-                    self.text_area.tag_add('misspelled', start_idx, end_idx)
-                    
-                    # Ensure misspelled styling doesn't override existing font attributes
-                    current_tags = self.text_area.tag_names(start_idx)
-                    for tag in current_tags:
-                        if tag != 'misspelled':
-                            font_config = self.text_area.tag_cget(tag, 'font')
-                            if font_config:
-                                self.text_area.tag_config('misspelled', font=font_config)
+            # Find words in visible text, skipping folded blocks
+            for segment_start, segment_end in self.visible_segments(first_visible, last_visible):
+                self.check_spelling_segment(batch, segment_start, segment_end, checked_words)
+            batch.apply()
 
             # Apply theme-aware misspelled styling
             self.text_area.tag_config('misspelled', 
@@ -901,6 +2504,30 @@ class TextEditor:
         except Exception as e:
             print(f"Error in check_spelling: {e}")
 
+    def check_spelling_segment(self, batch, first_visible, last_visible, checked_words):
+        text = self.text_area.get(first_visible, last_visible)
+        misspelled = []
+        
+        for match in completion.WORD_PATTERN.finditer(text):
+            word = match.group()
+            
+            # Skip checking if word is too short or likely a code identifier
+            if len(word) <= 1 or (word.lower() != word and word.upper() != word):
+                continue
+                
+            # Use cached result if available
+            if word.lower() in checked_words:
+                is_correct = checked_words[word.lower()]
+            else:
+                is_correct = self.spell_checker.check(word)
+                checked_words[word.lower()] = is_correct
+            
+            if not is_correct:
+                misspelled.append(match.span())
+
+        # The misspelled tag sets no font, so bold/italic runs underneath still show
+        batch.add_offsets('misspelled', text, tag_batch.parse_index(first_visible), misspelled)
+
     def create_spellcheck_menu(self):
         self.spellcheck_menu = tk.Menu(self.root, tearoff=0)
         self.spellcheck_menu.add_command(label="Replace with...", command=self.replace_word)
@@ -995,10 +2622,9 @@ class TextEditor:
         autosave_thread.start()
 
     def save_backup(self):
-        backup_path = 'backup.txt'
         try:
-            with open(backup_path, 'w') as backup_file:
-                backup_file.write(self.text_area.get(1.0, tk.END))
+            with open(self.BACKUP_PATH, 'w') as backup_file:
+                backup_file.write(self.text_area.get('1.0', 'end-1c'))
             self.status_bar.config(text="Autosaved backup")
         except Exception as e:
             self.status_bar.config(text=f"Autosave failed: {str(e)}")
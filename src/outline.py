@@ -0,0 +1,110 @@
+import ast
+import bisect
+
+PYTHON_EXTENSIONS = ('.py', '.pyw')
+
+# Statement lists that can hold nested definitions
+BODY_FIELDS = ('body', 'orelse', 'finalbody', 'handlers')
+
+
+class Symbol:
+    __slots__ = ('name', 'kind', 'line', 'end_line', 'depth', 'qualname')
+
+    def __init__(self, name, kind, line, end_line, depth, qualname):
+        self.name = name
+        self.kind = kind  # 'class', 'function' or 'method'
+        self.line = line
+        self.end_line = end_line
+        self.depth = depth
+        self.qualname = qualname
+
+
+def parse_symbols(source, first_line=1):
+    """Parse a slice of Python source starting at `first_line` into Symbols.
+
+    Raises SyntaxError if the slice doesn't parse on its own.
+    """
+    tree = ast.parse(source)
+    offset = first_line - 1
+    symbols = []
+
+    def visit(body, depth, parent):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if isinstance(node, ast.ClassDef):
+                    kind = 'class'
+                elif parent is not None and parent.kind == 'class':
+                    kind = 'method'
+                else:
+                    kind = 'function'
+                qualname = f"{parent.qualname}.{node.name}" if parent else node.name
+                symbol = Symbol(node.name, kind, node.lineno + offset,
+                                node.end_lineno + offset, depth, qualname)
+                symbols.append(symbol)
+                visit(node.body, depth + 1, symbol)
+            else:
+                # Definitions inside if/try/with blocks keep the enclosing depth
+                for field in BODY_FIELDS:
+                    statements = getattr(node, field, None)
+                    if statements:
+                        visit(statements, depth, parent)
+
+    visit(tree.body, 0, None)
+    return symbols
+
+
+class SymbolIndex:
+    """Classes, functions and methods of a buffer, kept sorted by line.
+
+    Edits shift line numbers in place; only the top-level blocks they touch
+    are re-parsed and swapped in with `replace_range`.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self._names = None  # Sorted (lowercase name, position) pairs for lookup
+
+    def clear(self):
+        self.symbols = []
+        self._names = None
+
+    def shift(self, line, delta):
+        """Adjust for `delta` lines inserted (or removed, if negative) after `line`"""
+        if not delta:
+            return
+        for symbol in self.symbols:
+            if symbol.line > line:
+                symbol.line = max(line, symbol.line + delta)
+            if symbol.end_line >= line:
+                symbol.end_line = max(symbol.line, symbol.end_line + delta)
+
+    def replace_range(self, start, end, symbols):
+        """Swap the symbols starting within lines start..end for freshly parsed ones"""
+        lines = [symbol.line for symbol in self.symbols]
+        lo = bisect.bisect_left(lines, start)
+        hi = bisect.bisect_right(lines, end)
+        self.symbols[lo:hi] = symbols
+        self._names = None
+
+    def lookup(self, query, limit=50):
+        """Symbols whose name starts with `query`, then those merely containing it"""
+        if self._names is None:
+            self._names = sorted((symbol.name.lower(), position)
+                                 for position, symbol in enumerate(self.symbols))
+        query = query.lower()
+        matches = []
+        index = bisect.bisect_left(self._names, (query, -1))
+        while index < len(self._names) and len(matches) < limit:
+            name, position = self._names[index]
+            if not name.startswith(query):
+                break
+            matches.append(position)
+            index += 1
+        if len(matches) < limit and query:
+            seen = set(matches)
+            for name, position in self._names:
+                if query in name and position not in seen:
+                    matches.append(position)
+                    if len(matches) >= limit:
+                        break
+        return [self.symbols[position] for position in matches]
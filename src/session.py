@@ -0,0 +1,43 @@
+import json
+import os
+import file_io
+
+VERSION = 1
+# Tags toggle_style/change_font_* put on text; their fonts are saved with the runs
+STYLE_TAGS = ('format', 'bold', 'italic', 'underline', 'bold_italic', 'bold_underline',
+              'italic_underline', 'bold_italic_underline')
+
+
+def session_path():
+    return os.path.join(os.path.expanduser('~'), '.simple_text_editor_session.json')
+
+
+def file_signature(path):
+    """[mtime_ns, size] of `path` (as FileWatcher records it), or None if it's gone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def dumps(snapshot):
+    return json.dumps(dict(snapshot, version=VERSION), separators=(',', ':'))
+
+
+def save(path, data):
+    """Write a serialised snapshot, replacing the old one only once it's complete"""
+    with file_io.replacing(path, 'w', encoding='utf-8') as session_file:
+        session_file.write(data)
+
+
+def load(path):
+    """The saved snapshot, or None if there isn't a usable one"""
+    try:
+        with open(path, 'r', encoding='utf-8') as session_file:
+            snapshot = json.load(session_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != VERSION:
+        return None
+    return snapshot
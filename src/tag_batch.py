@@ -0,0 +1,100 @@
+def parse_index(index):
+    line, column = str(index).split('.')
+    return int(line), int(column)
+
+
+def format_index(position):
+    return f"{position[0]}.{position[1]}"
+
+
+def offset_positions(text, first, offsets):
+    """Yield the (line, column) of each offset into `text`, which starts at `first`.
+
+    Offsets must be ascending; newlines are counted between consecutive ones,
+    so a whole pass over the text costs one scan however many offsets there are.
+    """
+    line, column = first
+    line_start = -column  # Offset at which the current line starts
+    last = 0
+    for offset in offsets:
+        newlines = text.count('\n', last, offset)
+        if newlines:
+            line += newlines
+            line_start = text.rfind('\n', last, offset) + 1
+        last = offset
+        yield line, offset - line_start
+
+
+def merge_spans(spans):
+    # Tk keeps each tag as sorted runs with overlapping and touching ranges joined
+    merged = []
+    for start, end in sorted(spans):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class TagBatch:
+    """Collects (tag, start, end) spans and applies them to a Text widget in one go.
+
+    Every tag given to `begin` or `add` ends up covering exactly the spans
+    collected for it. `apply` diffs them against the ranges the tag covers now
+    and issues at most one tag_remove and one tag_add per tag, each carrying
+    every range that changed. Given `start` and `end` (line, column)
+    positions, the pass only covers that part of the buffer and the tags are
+    left alone outside it.
+    """
+
+    def __init__(self, text_widget, start=None, end=None):
+        self.text_widget = text_widget
+        self.start = start
+        self.end = end
+        self.spans = {}
+
+    def begin(self, tag):
+        # A tag that collects nothing is cleared by apply()
+        self.spans.setdefault(tag, [])
+
+    def add(self, tag, start, end):
+        """Collect a span given as (line, column) positions"""
+        self.spans.setdefault(tag, []).append((start, end))
+
+    def add_offsets(self, tag, text, first, offsets):
+        """Collect (start, end) character offsets into `text`, which starts at `first`"""
+        self.add_tokens(text, first, ((tag, start, end) for start, end in offsets))
+
+    def add_tokens(self, text, first, tokens):
+        """Collect ascending (tag, start, end) offsets into `text`, which starts at `first`"""
+        tokens = list(tokens)
+        positions = offset_positions(text, first, (offset for _, start, end in tokens
+                                                   for offset in (start, end)))
+        for tag, _, _ in tokens:
+            self.spans.setdefault(tag, []).append((next(positions), next(positions)))
+
+    def apply(self):
+        widget = self.text_widget
+        for tag, spans in self.spans.items():
+            wanted = merge_spans(spans)
+            ranges = widget.tag_ranges(tag)
+            applied = [(parse_index(ranges[i]), parse_index(ranges[i + 1]))
+                       for i in range(0, len(ranges), 2)]
+            if self.start is not None:
+                applied = [(max(first, self.start), min(last, self.end)) for first, last in applied
+                           if first < self.end and last > self.start]
+            wanted_set = set(wanted)
+            applied_set = set(applied)
+            removed = [format_index(position) for span in applied if span not in wanted_set
+                       for position in span]
+            added = [format_index(position) for span in wanted if span not in applied_set
+                     for position in span]
+            if removed:
+                # Text.tag_remove only takes one range; Tk itself accepts any number
+                widget.tk.call(widget._w, 'tag', 'remove', tag, *removed)
+            if added:
+                widget.tag_add(tag, *added)
+        self.spans = {}
@@ -7,12 +7,24 @@ default_theme = {
     'select_bg': '#0078D7',
     'select_fg': '#FFFFFF',
     'keyword': '#0000FF',
+    'string': '#A31515',
+    'comment': '#008000',
+    'number': '#098658',
+    'constant': '#0070C1',
+    'directive': '#AF00DB',
+    'key': '#0451A5',
+    'variable': '#001080',
+    'heading': '#800000',
+    'emphasis': '#6F42C1',
     'bracket': '#FF0000',
     'misspelled': '#FF0000',
     'menu_bg': '#F0F0F0',
     'menu_fg': '#000000',
     'found_bg': '#FFFF00',
-    'found_fg': '#000000'
+    'found_fg': '#000000',
+    'diff_insert_bg': '#E6FFEC',
+    'diff_delete_bg': '#FFEBE9',
+    'diff_header_fg': '#6F42C1'
 }
 
 dark_theme = {
@@ -24,10 +36,22 @@ dark_theme = {
     'select_bg': '#264F78',
     'select_fg': '#FFFFFF',
     'keyword': '#569CD6',
+    'string': '#CE9178',
+    'comment': '#6A9955',
+    'number': '#B5CEA8',
+    'constant': '#4FC1FF',
+    'directive': '#C586C0',
+    'key': '#9CDCFE',
+    'variable': '#9CDCFE',
+    'heading': '#569CD6',
+    'emphasis': '#D7BA7D',
     'bracket': '#FF8C00',
     'misspelled': '#FF3333',
     'menu_bg': '#2D2D2D',
     'menu_fg': '#D4D4D4',
     'found_bg': '#515C6A',
-    'found_fg': '#FFFFFF'
+    'found_fg': '#FFFFFF',
+    'diff_insert_bg': '#1E3A28',
+    'diff_delete_bg': '#4B1F1F',
+    'diff_header_fg': '#C586C0'
 }
\ No newline at end of file
@@ -0,0 +1,208 @@
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+
+# Rough per-operation overhead (tuple, index string) used for the memory cap
+OP_OVERHEAD = 64
+
+
+def advance_index(index, text):
+    """Return the Text index just past `text` inserted at `index`"""
+    line, col = map(int, index.split('.'))
+    newlines = text.count('\n')
+    if not newlines:
+        return f"{line}.{col + len(text)}"
+    last_line = len(text) - text.rfind('\n') - 1
+    return f"{line + newlines}.{last_line}"
+
+
+def starts_word(previous, char):
+    # Typing groups break where a non-space follows a space
+    return previous.isspace() and not char.isspace()
+
+
+def history_path(file_path):
+    # Hidden sidecar next to the file, e.g. notes.txt -> .notes.txt.undo
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.undo")
+
+
+class UndoManager:
+    """Undo/redo history that stores diffs instead of document copies.
+
+    Each entry in the history is a group of ('insert' | 'delete', index, text)
+    operations. Consecutive single-character typing is merged into one
+    operation per word, and the oldest groups are dropped once the history
+    grows past `max_bytes`.
+    """
+
+    def __init__(self, apply_insert, apply_delete, max_bytes=16 * 1024 * 1024):
+        self.apply_insert = apply_insert
+        self.apply_delete = apply_delete
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+        self._group = None
+        self._group_depth = 0
+        self._can_merge = False
+        self._applying = False
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+        self._can_merge = False
+
+    def break_group(self):
+        # Stop typing from merging into the previous group (e.g. after a click)
+        self._can_merge = False
+
+    @contextmanager
+    def group(self):
+        """Record every edit made inside the block as a single undo step"""
+        if self._group_depth == 0:
+            self._group = []
+        self._group_depth += 1
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                if self._group:
+                    self.undo_stack.append(self._group)
+                    self._evict()
+                self._group = None
+                self._can_merge = False
+
+    def record(self, edits):
+        """Edit listener: called with the edits of every insert/delete on the buffer.
+
+        Several edits from one command (a multi-range delete, a replace, an
+        insert at every cursor) make a single undo step.
+        """
+        if len(edits) > 1:
+            with self.group():
+                for edit in edits:
+                    self._record(*edit)
+        else:
+            self._record(*edits[0])
+
+    def _record(self, kind, index, text):
+        if self._applying or not text:
+            return
+        self.redo_stack.clear()
+        op = (kind, index, text)
+        self.size += len(text) + OP_OVERHEAD
+        if self._group_depth:
+            self._group.append(op)
+            return
+        if self._can_merge and self.undo_stack:
+            merged = self._merge(self.undo_stack[-1][-1], op)
+            if merged:
+                self.size -= OP_OVERHEAD
+                self.undo_stack[-1][-1] = merged
+                return
+        self.undo_stack.append([op])
+        self._can_merge = len(text) == 1 and text != '\n'
+        self._evict()
+
+    def _merge(self, prev, op):
+        kind, index, text = op
+        prev_kind, prev_index, prev_text = prev
+        if kind != prev_kind or len(text) != 1 or text == '\n':
+            return None
+        if kind == 'insert':
+            if index != advance_index(prev_index, prev_text) or starts_word(prev_text[-1], text):
+                return None
+            return (kind, prev_index, prev_text + text)
+        if index == prev_index:
+            # Forward delete keeps removing at the same position
+            if starts_word(prev_text[-1], text):
+                return None
+            return (kind, index, prev_text + text)
+        if advance_index(index, text) == prev_index:
+            # Backspace removes the character just before the previous one
+            if starts_word(prev_text[0], text):
+                return None
+            return (kind, index, text + prev_text)
+        return None
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            dropped = self.undo_stack.popleft()
+            self.size -= sum(len(text) + OP_OVERHEAD for _, _, text in dropped)
+
+    def undo(self):
+        """Revert the newest group; returns the index to place the cursor at"""
+        if not self.undo_stack:
+            return None
+        group = self.undo_stack.pop()
+        self.size -= sum(len(text) + OP_OVERHEAD for _, _, text in group)
+        position = None
+        self._applying = True
+        try:
+            for kind, index, text in reversed(group):
+                if kind == 'insert':
+                    self.apply_delete(index, advance_index(index, text))
+                else:
+                    self.apply_insert(index, text)
+                    position = advance_index(index, text)
+                    continue
+                position = index
+        finally:
+            self._applying = False
+        self.redo_stack.append(group)
+        self._can_merge = False
+        return position
+
+    def redo(self):
+        """Re-apply the newest undone group; returns the new cursor index"""
+        if not self.redo_stack:
+            return None
+        group = self.redo_stack.pop()
+        position = None
+        self._applying = True
+        try:
+            for kind, index, text in group:
+                if kind == 'insert':
+                    self.apply_insert(index, text)
+                    position = advance_index(index, text)
+                else:
+                    self.apply_delete(index, advance_index(index, text))
+                    position = index
+        finally:
+            self._applying = False
+        self.undo_stack.append(group)
+        self.size += sum(len(text) + OP_OVERHEAD for _, _, text in group)
+        self._evict()
+        self._can_merge = False
+        return position
+
+    def save(self, path, content_hash):
+        data = {
+            'version': 1,
+            'hash': content_hash,
+            'undo': [[list(op) for op in group] for group in self.undo_stack],
+            'redo': [[list(op) for op in group] for group in self.redo_stack],
+        }
+        with open(path, 'w', encoding='utf-8') as history_file:
+            json.dump(data, history_file, separators=(',', ':'))
+
+    def load(self, path, content_hash):
+        """Restore history saved for this exact content; returns True on success"""
+        try:
+            with open(path, 'r', encoding='utf-8') as history_file:
+                data = json.load(history_file)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != 1 or data.get('hash') != content_hash:
+            return False
+        self.clear()
+        for group in data['undo']:
+            self.undo_stack.append([tuple(op) for op in group])
+            self.size += sum(len(op[2]) + OP_OVERHEAD for op in group)
+        self.redo_stack = [[tuple(op) for op in group] for group in data['redo']]
+        self._evict()
+        return True